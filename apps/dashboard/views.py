@@ -14,26 +14,24 @@ from apps.role.models import Role
 from apps.permission.models import Permission, Menu
 from apps.notify.models import Notification
 
-@get("/api/dashboard/stat")
+@get("/api/dashboard/stat", perm="dashboard:view")
 def dashboard_stat(request):
     """仪表盘统计数据"""
     user_id = request.user.get("id")
     # 统计各模块数量
     stat = {
-        "user_count": len(User.filter()),
-        "role_count": len(Role.filter()),
-        "perm_count": len(Permission.filter()),
-        "menu_count": len(Menu.filter()),
-        "unread_notify": len(Notification.filter(user_id__in=[None, user_id], is_read=0))
+        "user_count": User.count(),
+        "role_count": Role.count(),
+        "perm_count": Permission.count(),
+        "menu_count": Menu.count(),
+        "unread_notify": Notification.count(user_id__in=[None, user_id], is_read=0)
     }
     # 近7天注册用户（简化版）
     stat["new_user_7d"] = 0
-    # 角色分布
-    role_dist = []
-    for role in Role.filter():
-        role_dist.append({
-            "name": role.name,
-            "count": len(User.filter(role_id=role.id))
-        })
-    stat["role_dist"] = role_dist
+    # 角色分布：一次分组计数
+    user_counts = User.count_by("role_id")
+    stat["role_dist"] = [
+        {"name": role.name, "count": user_counts.get(role.id, 0)}
+        for role in Role.filter()
+    ]
     return stat
\ No newline at end of file
@@ -12,7 +12,7 @@ from core.router import post, get, put, delete
 from utils.logger import logger
 from apps.notify.models import Notification
 
-@post("/api/notify/add")
+@post("/api/notify/add", perm="notify:manage")
 def notify_add(request):
     """添加通知"""
     title = request.body.get("title")
@@ -37,12 +37,16 @@ def notify_list(request):
     page = int(request.query.get("page", 1))
     page_size = int(request.query.get("page_size", 10))
     user_id = request.user.get("id")
-    # 全体通知+个人通知
-    paginated = Notification.paginate(
-        page=page,
-        page_size=page_size,
-        **{"user_id__in": [None, user_id]}  # ORM扩展in查询，简化版
-    )
+    # 全体通知+个人通知，两种分页方式均为最新通知在前
+    query = Notification.where(user_id__in=[None, user_id]).order_by("-id")
+    if request.query.get("mode") == "keyset" or request.query.get("cursor"):
+        # 游标分页（无限滚动，mode=keyset，首页不带cursor）
+        try:
+            paginated = query.paginate_keyset(request.query.get("cursor") or None, page_size)
+        except ValueError:
+            return 400, {"msg": "无效的分页游标"}
+    else:
+        paginated = query.paginate(page, page_size)
     paginated["list"] = [n.to_dict() for n in paginated["list"]]
     return paginated
 
@@ -50,18 +54,16 @@ def notify_list(request):
 def unread_count(request):
     """未读通知数量"""
     user_id = request.user.get("id")
-    # 简化版：实际需用count查询
-    unread = Notification.filter(user_id__in=[None, user_id], is_read=0)
-    return {"count": len(unread)}
+    return {"count": Notification.count(user_id__in=[None, user_id], is_read=0)}
 
-@put("/api/notify/read/<notify_id>")
+@put("/api/notify/read/<notify_id:int>")
 def notify_read(request, notify_id):
     """标记通知为已读"""
     notify = Notification.get(id=notify_id)
     if not notify:
         return 404, {"msg": "通知不存在"}
     # 检查权限：个人通知或全体通知
-    if notify.user_id and notify.user_id != request.user.get("id"):
+    if notify.user_id_id and notify.user_id_id != request.user.get("id"):
         return 403, {"msg": "无权限操作该通知"}
     notify.is_read = 1
     notify.save()
@@ -71,14 +73,11 @@ def notify_read(request, notify_id):
 def notify_read_all(request):
     """全部标为已读"""
     user_id = request.user.get("id")
-    notifies = Notification.filter(user_id__in=[None, user_id], is_read=0)
-    for n in notifies:
-        n.is_read = 1
-        n.save()
+    count = Notification.where(user_id__in=[None, user_id], is_read=0).update(is_read=1)
     logger.info(f"[Notify] Mark all notify as read by {request.user.get('username')}")
-    return {"msg": "全部标为已读成功", "count": len(notifies)}
+    return {"msg": "全部标为已读成功", "count": count}
 
-@delete("/api/notify/delete/<notify_id>")
+@delete("/api/notify/delete/<notify_id:int>", perm="notify:manage")
 def notify_delete(request, notify_id):
     """删除通知"""
     notify = Notification.get(id=notify_id)
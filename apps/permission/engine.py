@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+权限引擎：角色→权限标识索引，请求时鉴权为O(1)集合查找
+- 一次性加载 roles/role_permissions/permissions，把每个角色编译为权限标识的frozenset
+- 父权限蕴含子权限：拥有某权限即拥有其 parent_id 子树下的全部权限
+- 通配符："*" 拥有全部权限；"user:*" 拥有全部 "user:" 开头的权限（含未登记在权限表中的标识）
+- 增量重建：分配权限/增删角色只重新编译该角色；权限增删改影响权限树，全量重建
+- 每个进程一份索引，超过PERM_INDEX_TTL秒自动全量重建，其他进程的变更最多延迟该时间生效
+- 索引加载绕过ORM查询缓存，重建时总是读取数据库最新数据
+"""
+import time
+import threading
+from config.settings import PERM_INDEX_TTL
+from utils.logger import logger
+
+# 全部权限通配符
+WILDCARD = "*"
+
+
+class PermissionIndex:
+    """角色权限索引：重建时生成新字典后整体替换，读取无需加锁"""
+    def __init__(self, ttl=PERM_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at = 0
+        self._perms = {}        # {权限ID: 权限标识}
+        self._children = {}     # {父权限ID: [子权限ID]}
+        self._role_codes = {}   # {角色ID: frozenset(权限标识)}
+
+    # ---------- 编译 ----------
+    def _expand(self, perm_ids):
+        """展开权限ID集合：父权限蕴含子权限，"xxx:*" 展开为同前缀的全部权限"""
+        codes = set()
+        stack = list(perm_ids)
+        seen = set()
+        while stack:
+            perm_id = stack.pop()
+            if perm_id in seen or perm_id not in self._perms:
+                continue
+            seen.add(perm_id)
+            codes.add(self._perms[perm_id])
+            stack.extend(self._children.get(perm_id, ()))
+        for code in [code for code in codes if code.endswith(":*")]:
+            prefix = code[:-1]
+            codes.update(c for c in self._perms.values() if c.startswith(prefix))
+        return frozenset(codes)
+
+    def _load_tree(self):
+        from apps.permission.models import Permission
+        perms, children = {}, {}
+        for row in Permission.where().no_cache().values("id", "code", "parent_id"):
+            perms[row["id"]] = row["code"]
+            children.setdefault(row["parent_id"] or 0, []).append(row["id"])
+        self._perms, self._children = perms, children
+
+    @staticmethod
+    def _load_grants(role_id=None):
+        """读取角色已分配的权限ID {角色ID: [权限ID]}"""
+        from apps.role.models import RolePermission
+        filters = {} if role_id is None else {"role_id": role_id}
+        grants = {}
+        for rid, perm_id in RolePermission.where(**filters).no_cache().values_list("role_id", "permission_id"):
+            grants.setdefault(rid, []).append(perm_id)
+        return grants
+
+    # ---------- 重建 ----------
+    def _expired(self):
+        return not self._loaded_at or (self.ttl > 0 and time.time() - self._loaded_at > self.ttl)
+
+    def rebuild(self, only_if_expired=False):
+        """全量重建（权限树变化或索引过期时）；only_if_expired=True时拿到锁后再检查一次，避免并发重复重建"""
+        from apps.role.models import Role
+        with self._lock:
+            if only_if_expired and not self._expired():
+                return
+            self._load_tree()
+            grants = self._load_grants()
+            self._role_codes = {
+                role_id: self._expand(grants.get(role_id, ()))
+                for role_id in Role.where().no_cache().values_list("id", flat=True)
+            }
+            self._loaded_at = time.time()
+        logger.debug(f"[Permission] Index rebuilt: {len(self._role_codes)} roles, {len(self._perms)} permissions")
+
+    def rebuild_role(self, role_id):
+        """增量重建单个角色（分配权限/新增角色后）"""
+        if not self._loaded_at:
+            return self.rebuild(only_if_expired=True)
+        with self._lock:
+            codes = self._expand(self._load_grants(role_id).get(role_id, ()))
+            self._role_codes = {**self._role_codes, role_id: codes}
+
+    def remove_role(self, role_id):
+        """删除角色后移除其索引"""
+        with self._lock:
+            role_codes = dict(self._role_codes)
+            role_codes.pop(role_id, None)
+            self._role_codes = role_codes
+
+    def _ensure_loaded(self):
+        if self._expired():
+            self.rebuild(only_if_expired=True)
+
+    # ---------- 查询 ----------
+    def codes_for(self, role_id):
+        """角色拥有的权限标识（已展开）"""
+        self._ensure_loaded()
+        return self._role_codes.get(role_id, frozenset())
+
+    def has_perm(self, role_id, code):
+        """角色是否拥有权限code"""
+        codes = self.codes_for(role_id)
+        if code in codes or WILDCARD in codes:
+            return True
+        prefix, sep, _ = code.partition(":")
+        return bool(sep) and f"{prefix}:*" in codes
+
+
+# 进程内全局索引
+permission_index = PermissionIndex()
@@ -12,6 +12,7 @@ from core import Model, IntField, StrField, DateTimeField
 
 class Permission(Model):
     __table_name__ = "permissions"
+    __cache_ttl__ = 300  # 读多写少，开启查询缓存
     id = IntField(primary_key=True, comment="权限ID")
     code = StrField(length=64, unique=True, nullable=False, comment="权限标识")
     name = StrField(length=32, nullable=False, comment="权限名称")
@@ -23,6 +24,7 @@ class Permission(Model):
 
 class Menu(Model):
     __table_name__ = "menus"
+    __cache_ttl__ = 300  # 读多写少，开启查询缓存
     id = IntField(primary_key=True, comment="菜单ID")
     name = StrField(length=32, nullable=False, comment="菜单名称")
     path = StrField(length=64, nullable=False, comment="路由路径")
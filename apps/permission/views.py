@@ -2,10 +2,12 @@
 # -*- coding: utf-8 -*-
 from core.router import post, get, put, delete
 from utils.logger import logger
+from core.orm.transaction import on_commit
 from utils.tree import build_tree
 from apps.permission.models import Permission, Menu
+from apps.permission.engine import permission_index
 
-@post("/api/permission/add")
+@post("/api/permission/add", perm="permission:manage")
 def perm_add(request):
     """添加权限"""
     code = request.body.get("code")
@@ -14,7 +16,7 @@ def perm_add(request):
     if not code or not name or type is None:
         return 400, {"msg": "权限标识、名称、类型不能为空"}
     
-    if Permission.get(code=code):
+    if Permission.exists(code=code):
         return 400, {"msg": "权限标识已存在"}
     
     perm = Permission(
@@ -25,19 +27,19 @@ def perm_add(request):
         sort=request.body.get("sort", 0)
     )
     perm.save()
+    on_commit(permission_index.rebuild)
     logger.info(f"[Permission] Add perm {code} by {request.user.get('username')}")
     return perm.to_dict()
 
 @get("/api/permission/list")
 def perm_list(request):
     """权限列表（树形）"""
-    perms = Permission.filter()
-    perm_list = [p.to_dict() for p in perms]
+    perm_list = Permission.values()
     # 构建树形结构
     tree = build_tree(perm_list, "id", "parent_id", "children")
     return tree
 
-@put("/api/permission/edit/<perm_id>")
+@put("/api/permission/edit/<perm_id:int>", perm="permission:manage")
 def perm_edit(request, perm_id):
     """编辑权限"""
     perm = Permission.get(id=perm_id)
@@ -46,7 +48,7 @@ def perm_edit(request, perm_id):
     
     if "code" in request.body:
         code = request.body.get("code")
-        if code != perm.code and Permission.get(code=code):
+        if code != perm.code and Permission.exists(code=code):
             return 400, {"msg": "权限标识已存在"}
         perm.code = code
     if "name" in request.body:
@@ -59,36 +61,35 @@ def perm_edit(request, perm_id):
         perm.sort = request.body.get("sort", 0)
     
     perm.save()
+    on_commit(permission_index.rebuild)
     logger.info(f"[Permission] Edit perm {perm_id} by {request.user.get('username')}")
     return perm.to_dict()
 
-@delete("/api/permission/delete/<perm_id>")
+@delete("/api/permission/delete/<perm_id:int>", atomic=True, perm="permission:manage")
 def perm_delete(request, perm_id):
     """删除权限"""
     perm = Permission.get(id=perm_id)
     if not perm:
         return 404, {"msg": "权限不存在"}
-    # 删除子权限
-    child_perms = Permission.filter(parent_id=perm_id)
-    for cp in child_perms:
-        cp.delete()
-    # 删除角色-权限关联
+    # 删除角色-权限关联（含子权限）
     from apps.role.models import RolePermission
-    for rp in RolePermission.filter(permission_id=perm_id):
-        rp.delete()
+    child_ids = Permission.values_list("id", flat=True, parent_id=perm_id)
+    RolePermission.where(permission_id__in=[perm_id] + child_ids).delete()
+    # 删除子权限
+    Permission.where(parent_id=perm_id).delete()
     perm.delete()
+    on_commit(permission_index.rebuild)
     logger.info(f"[Permission] Delete perm {perm_id} by {request.user.get('username')}")
     return {"msg": "删除成功"}
 
 @get("/api/menu/list")
 def menu_list(request):
     """菜单列表（树形）"""
-    menus = Menu.filter(is_show=1)
-    menu_list = [m.to_dict() for m in menus]
+    menu_list = Menu.values("id", "name", "path", "component", "icon", "parent_id", "sort", "permission_code", is_show=1)
     tree = build_tree(menu_list, "id", "parent_id", "children")
     return tree
 
-@post("/api/menu/add")
+@post("/api/menu/add", perm="permission:manage")
 def menu_add(request):
     """添加菜单"""
     name = request.body.get("name")
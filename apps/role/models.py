@@ -12,6 +12,7 @@ from core import Model, IntField, StrField, BoolField, DateTimeField
 
 class Role(Model):
     __table_name__ = "roles"
+    __cache_ttl__ = 60  # 读多写少，开启查询缓存
     id = IntField(primary_key=True, comment="角色ID")
     name = StrField(length=32, unique=True, nullable=False, comment="角色名称")
     code = StrField(length=64, unique=True, nullable=False, comment="角色标识")
@@ -2,10 +2,13 @@
 # -*- coding: utf-8 -*-
 from core.router import post, get, put, delete
 from utils.logger import logger
+from core.middleware.auth import evict_role_principals
+from core.orm.transaction import on_commit
 from apps.role.models import Role, RolePermission
 from apps.permission.models import Permission
+from apps.permission.engine import permission_index
 
-@post("/api/role/add")
+@post("/api/role/add", perm="role:manage")
 def role_add(request):
     """添加角色"""
     name = request.body.get("name")
@@ -13,9 +16,9 @@ def role_add(request):
     if not name or not code:
         return 400, {"msg": "角色名称和标识不能为空"}
     
-    if Role.get(name=name):
+    if Role.exists(name=name):
         return 400, {"msg": "角色名称已存在"}
-    if Role.get(code=code):
+    if Role.exists(code=code):
         return 400, {"msg": "角色标识已存在"}
     
     role = Role(
@@ -26,6 +29,7 @@ def role_add(request):
         sort=request.body.get("sort", 0)
     )
     role.save()
+    on_commit(lambda: permission_index.rebuild_role(role.id))
     logger.info(f"[Role] Add role {name} by {request.user.get('username')}")
     return role.to_dict()
 
@@ -35,14 +39,14 @@ def role_list(request):
     page = int(request.query.get("page", 1))
     page_size = int(request.query.get("page_size", 10))
     paginated = Role.paginate(page=page, page_size=page_size)
-    # 补充权限数量
-    for role in paginated["list"]:
-        perm_count = len(RolePermission.filter(role_id=role.id))
-        role.perm_count = perm_count
-    paginated["list"] = [r.to_dict() for r in paginated["list"]]
+    # 补充权限数量（当前页角色一次分组计数）
+    perm_counts = RolePermission.count_by("role_id", role_id__in=[r.id for r in paginated["list"]])
+    paginated["list"] = [
+        {**r.to_dict(), "perm_count": perm_counts.get(r.id, 0)} for r in paginated["list"]
+    ]
     return paginated
 
-@put("/api/role/edit/<role_id>")
+@put("/api/role/edit/<role_id:int>", perm="role:manage")
 def role_edit(request, role_id):
     """编辑角色"""
     role = Role.get(id=role_id)
@@ -54,12 +58,12 @@ def role_edit(request, role_id):
     
     if "name" in request.body:
         name = request.body.get("name")
-        if name != role.name and Role.get(name=name):
+        if name != role.name and Role.exists(name=name):
             return 400, {"msg": "角色名称已存在"}
         role.name = name
     if "code" in request.body:
         code = request.body.get("code")
-        if code != role.code and Role.get(code=code):
+        if code != role.code and Role.exists(code=code):
             return 400, {"msg": "角色标识已存在"}
         role.code = code
     if "desc" in request.body:
@@ -68,10 +72,11 @@ def role_edit(request, role_id):
         role.sort = request.body.get("sort", 0)
     
     role.save()
+    on_commit(lambda: evict_role_principals(role_id))
     logger.info(f"[Role] Edit role {role_id} by {request.user.get('username')}")
     return role.to_dict()
 
-@delete("/api/role/delete/<role_id>")
+@delete("/api/role/delete/<role_id:int>", atomic=True, perm="role:manage")
 def role_delete(request, role_id):
     """删除角色"""
     role = Role.get(id=role_id)
@@ -80,35 +85,32 @@ def role_delete(request, role_id):
     if role.is_admin == 1:
         return 403, {"msg": "禁止删除超级管理员角色"}
     # 删除角色及关联权限
-    RolePermission.filter(role_id=role_id)
-    for rp in RolePermission.filter(role_id=role_id):
-        rp.delete()
+    RolePermission.where(role_id=role_id).delete()
     role.delete()
+    on_commit(lambda: evict_role_principals(role_id))
+    on_commit(lambda: permission_index.remove_role(role_id))
     logger.info(f"[Role] Delete role {role_id} by {request.user.get('username')}")
     return {"msg": "删除成功"}
 
-@post("/api/role/assign-perm/<role_id>")
+@post("/api/role/assign-perm/<role_id:int>", atomic=True, perm="role:manage")
 def assign_perm(request, role_id):
     """角色分配权限"""
     perm_ids = request.body.get("perm_ids", [])
     if not isinstance(perm_ids, list):
         return 400, {"msg": "权限ID必须为数组"}
     
+    # 只保留存在的权限ID
+    valid_ids = Permission.values_list("id", flat=True, id__in=perm_ids) if perm_ids else []
     # 删除原有权限
-    for rp in RolePermission.filter(role_id=role_id):
-        rp.delete()
-    # 添加新权限
-    for perm_id in perm_ids:
-        if Permission.get(id=perm_id):
-            rp = RolePermission(role_id=role_id, permission_id=perm_id)
-            rp.save()
+    RolePermission.where(role_id=role_id).delete()
+    # 添加新权限（批量插入）
+    RolePermission.bulk_create([RolePermission(role_id=role_id, permission_id=perm_id) for perm_id in valid_ids])
+    on_commit(lambda: permission_index.rebuild_role(role_id))
     logger.info(f"[Role] Assign {len(perm_ids)} permissions to role {role_id} by {request.user.get('username')}")
     return {"msg": "权限分配成功", "count": len(perm_ids)}
 
-@get("/api/role/perm-list/<role_id>")
+@get("/api/role/perm-list/<role_id:int>", perm="role:manage")
 def role_perm_list(request, role_id):
     """获取角色已分配权限"""
-    rp_list = RolePermission.filter(role_id=role_id)
-    perm_ids = [rp.permission_id for rp in rp_list]
-    perms = [Permission.get(id=p).to_dict() for p in perm_ids if Permission.get(id=p)]
+    perm_ids = RolePermission.values_list("permission_id", flat=True, role_id=role_id)
     return perm_ids
\ No newline at end of file
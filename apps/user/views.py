@@ -1,16 +1,22 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import io
+import csv
 import time
 from utils.jwt_tool import jwt_encode, jwt_decode
 from core.router import post, get, put, delete
 from config.settings import SECRET_KEY  # 保留，作为JWT签名密钥
-from utils.crypto import encrypt_pwd, verify_pwd
+from utils.password import password_service, PasswordServiceBusy
 from utils.logger import logger
+from core.server import Response
+from core.middleware.auth import evict_principal
+from core.orm.transaction import on_commit
 from apps.user.models import User
-from apps.role.models import Role
 
 # JWT过期时间（24小时），保留原有配置
 JWT_EXPIRE = 86400
+# 密码哈希服务排队超时时的响应
+PWD_BUSY_RESPONSE = (503, {"msg": "服务繁忙，请稍后重试"})
 
 @post("/api/user/login")
 def user_login(request):
@@ -21,16 +27,22 @@ def user_login(request):
         return 400, {"msg": "用户名和密码不能为空"}
     
     # 查询用户（原有逻辑完全不变）
-    user = User.get(username=username)
+    user = User.where(username=username).select_related("role_id").first()
     if not user:
         return 401, {"msg": "用户名或密码错误"}
     if user.status == 0:
         return 401, {"msg": "用户已被禁用"}
     
-    # 验证密码（原有逻辑完全不变）
-    if not verify_pwd(password, user.password):
-        logger.warning(f"[User] Login failed, wrong password for {username}")
-        return 401, {"msg": "用户名或密码错误"}
+    # 验证密码（进程池计算）；迭代次数配置变化时顺带按新次数重新哈希
+    try:
+        if not password_service.verify(password, user.password):
+            logger.warning(f"[User] Login failed, wrong password for {username}")
+            return 401, {"msg": "用户名或密码错误"}
+        if password_service.needs_rehash(user.password):
+            user.password = password_service.hash(password)
+            logger.info(f"[User] Rehash password for {username}")
+    except PasswordServiceBusy:
+        return PWD_BUSY_RESPONSE
     
     # 更新最后登录时间（原有逻辑完全不变）
     user.last_login_time = time.strftime("%Y-%m-%d %H:%M:%S")
@@ -48,7 +60,7 @@ def user_login(request):
     # 返回用户信息（脱敏，原有逻辑完全不变）
     user_info = user.to_dict(desensitize_fields=["phone", "email"])
     del user_info["password"]
-    user_info["role"] = Role.get(id=user.role_id).name
+    user_info["role"] = user.role_id.name
     
     logger.info(f"[User] {username} login success from {request.client_addr}")
     return {
@@ -61,8 +73,8 @@ def user_login(request):
 def user_info(request):
     """获取当前用户信息：原有逻辑完全不变"""
     user_id = request.user.get("id")
-    user = User.get(id=user_id)
-    role = Role.get(id=user.role_id)
+    user = User.where(id=user_id).select_related("role_id").first()
+    role = user.role_id
     user_info = user.to_dict(desensitize_fields=["phone", "email"])
     del user_info["password"]
     user_info["role"] = role.name
@@ -70,7 +82,7 @@ def user_info(request):
     user_info["is_admin"] = request.user.get("is_admin", False)
     return user_info
 
-@post("/api/user/add")
+@post("/api/user/add", perm="user:add")
 def user_add(request):
     """添加用户：原有逻辑完全不变"""
     required = ["username", "password", "nickname", "role_id"]
@@ -78,10 +90,13 @@ def user_add(request):
         if not request.body.get(field):
             return 400, {"msg": f"{field}不能为空"}
     
-    if User.get(username=request.body.get("username")):
+    if User.exists(username=request.body.get("username")):
         return 400, {"msg": "用户名已存在"}
     
-    pwd = encrypt_pwd(request.body.get("password"))
+    try:
+        pwd = password_service.hash(request.body.get("password"))
+    except PasswordServiceBusy:
+        return PWD_BUSY_RESPONSE
     
     user = User(
         username=request.body.get("username"),
@@ -96,32 +111,69 @@ def user_add(request):
     logger.info(f"[User] Add user {user.username} by {request.user.get('username')}")
     return user.to_dict(desensitize_fields=["phone", "email"])
 
-@get("/api/user/list")
+@get("/api/user/list", perm="user:manage")
 def user_list(request):
     """用户列表（分页）：原有逻辑完全不变"""
     page = int(request.query.get("page", 1))
     page_size = int(request.query.get("page_size", 10))
     keyword = request.query.get("keyword", "")
     
-    if keyword:
-        users = User.filter(username__like=f"%{keyword}%")
-        total = len(users)
-        paginated = {
-            "list": [u.to_dict(desensitize_fields=["phone", "email"]) for u in users[(page-1)*page_size:page*page_size]],
-            "page": page,
-            "page_size": page_size,
-            "total": total,
-            "total_pages": (total + page_size - 1) // page_size
-        }
+    filters = {"username__like": f"%{keyword}%"} if keyword else {}
+    # 角色随用户同一条SQL联表加载
+    query = User.where(**filters).select_related("role_id")
+    if request.query.get("mode") == "keyset" or request.query.get("cursor"):
+        # 游标分页（无限滚动，mode=keyset，首页不带cursor）：深翻页不使用OFFSET；无过滤条件时总数取表行数估算值
+        try:
+            paginated = query.paginate_keyset(request.query.get("cursor") or None, page_size,
+                                              with_total="exact" if keyword else "estimate")
+        except ValueError:
+            return 400, {"msg": "无效的分页游标"}
     else:
-        paginated = User.paginate(page=page, page_size=page_size)
-        paginated["list"] = [u.to_dict(desensitize_fields=["phone", "email"]) for u in paginated["list"]]
-    
-    for user in paginated["list"]:
-        user["role_name"] = Role.get(id=user["role_id"]).name
+        paginated = query.paginate(page, page_size)
+    users = paginated["list"]
+    paginated["list"] = []
+    for u in users:
+        user = u.to_dict(desensitize_fields=["phone", "email"])
+        user["role_name"] = u.role_id.name if u.role_id else ""
+        paginated["list"].append(user)
     return paginated
 
-@put("/api/user/edit/<user_id>")
+# 导出字段
+EXPORT_FIELDS = ["id", "username", "nickname", "email", "phone", "role_id", "status", "last_login_time", "create_time"]
+# 导出时每批读取/写出的行数
+EXPORT_CHUNK_SIZE = 2000
+
+@get("/api/user/export", perm="user:manage")
+def user_export(request):
+    """导出用户CSV：服务端游标分批读取+分块响应，内存占用与用户总数无关"""
+    keyword = request.query.get("keyword", "")
+    filters = {"username__like": f"%{keyword}%"} if keyword else {}
+    users = User.where(**filters).order_by("id").iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        buffer.write("\ufeff")  # BOM：Excel正确识别UTF-8中文
+        writer.writeheader()
+        try:
+            for count, user in enumerate(users, 1):
+                writer.writerow(user.to_dict(desensitize_fields=["phone", "email"]))
+                if count % EXPORT_CHUNK_SIZE == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        finally:
+            users.close()
+
+    logger.info(f"[User] Export users by {request.user.get('username')}")
+    response = Response(headers={
+        "Content-Type": "text/csv; charset=utf-8",
+        "Content-Disposition": "attachment; filename=users.csv"
+    })
+    return response.stream(generate())
+
+@put("/api/user/edit/<user_id:int>", perm="user:edit")
 def user_edit(request, user_id):
     """编辑用户：原有逻辑完全不变"""
     user = User.get(id=user_id)
@@ -141,22 +193,26 @@ def user_edit(request, user_id):
     if "status" in request.body:
         user.status = request.body.get("status")
     if "password" in request.body and request.body.get("password"):
-        user.password = encrypt_pwd(request.body.get("password"))
+        try:
+            user.password = password_service.hash(request.body.get("password"))
+        except PasswordServiceBusy:
+            return PWD_BUSY_RESPONSE
     
     user.save()
+    on_commit(lambda: evict_principal(user_id))
     logger.info(f"[User] Edit user {user_id} by {request.user.get('username')}")
     return user.to_dict(desensitize_fields=["phone", "email"])
 
-@delete("/api/user/delete/<user_id>")
+@delete("/api/user/delete/<user_id:int>", perm="user:delete")
 def user_delete(request, user_id):
     """删除用户：原有逻辑完全不变"""
-    user = User.get(id=user_id)
+    user = User.where(id=user_id).select_related("role_id").first()
     if not user:
         return 404, {"msg": "用户不存在"}
-    role = Role.get(id=user.role_id)
-    if role.is_admin == 1:
+    if user.role_id and user.role_id.is_admin == 1:
         return 403, {"msg": "禁止删除超级管理员"}
     user.delete()
+    on_commit(lambda: evict_principal(user_id))
     logger.info(f"[User] Delete user {user_id} by {request.user.get('username')}")
     return {"msg": "删除成功"}
 
@@ -169,10 +225,12 @@ def change_pwd(request):
         return 400, {"msg": "原密码和新密码不能为空"}
     
     user = User.get(id=request.user.get("id"))
-    if not verify_pwd(old_pwd, user.password):
-        return 400, {"msg": "原密码错误"}
-    
-    user.password = encrypt_pwd(new_pwd)
+    try:
+        if not password_service.verify(old_pwd, user.password):
+            return 400, {"msg": "原密码错误"}
+        user.password = password_service.hash(new_pwd)
+    except PasswordServiceBusy:
+        return PWD_BUSY_RESPONSE
     user.save()
     logger.info(f"[User] Change password for {user.username}")
     return {"msg": "密码修改成功"}
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JWT验证微基准：原实现（每次拆分+HMAC+解码载荷） vs 预生成HMAC对象 vs 已验证Token缓存
+用法：python bench/bench_jwt.py（无需数据库）
+"""
+import os
+import sys
+import time
+import json
+import hmac
+import hashlib
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from utils import jwt_tool
+from utils.jwt_tool import jwt_encode, jwt_verify_batch, base64url_decode
+
+SECRET = "bench_secret_key"
+# 不同Token数与每个Token的重复验证次数（模拟同一用户的连续请求）
+TOKENS = 1000
+REPEAT = 20
+
+
+def legacy_decode(token, secret_key):
+    """原实现：每次从字符串密钥计算HMAC并解析载荷"""
+    header_encoded, payload_encoded, signature_encoded = token.split('.')
+    sign_data = f"{header_encoded}.{payload_encoded}".encode('utf-8')
+    expected = hmac.new(secret_key.encode('utf-8'), sign_data, hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, base64url_decode(signature_encoded)):
+        raise ValueError("Invalid JWT signature")
+    payload = json.loads(base64url_decode(payload_encoded).decode('utf-8'))
+    if time.time() > payload["exp"]:
+        raise ValueError("Expired JWT token")
+    return payload
+
+
+def bench(func, tokens):
+    start = time.perf_counter()
+    func(tokens)
+    return time.perf_counter() - start
+
+
+def main():
+    exp = int(time.time()) + 3600
+    tokens = [jwt_encode({"user_id": i, "username": f"user{i}", "exp": exp}, SECRET) for i in range(TOKENS)]
+    workload = tokens * REPEAT
+    assert jwt_verify_batch(tokens[:10], SECRET) == [legacy_decode(t, SECRET) for t in tokens[:10]]
+
+    legacy_cost = bench(lambda ts: [legacy_decode(t, SECRET) for t in ts], workload)
+    jwt_tool._verified.clear()
+    size, jwt_tool.JWT_CACHE_SIZE = jwt_tool.JWT_CACHE_SIZE, 0
+    prekeyed_cost = bench(lambda ts: jwt_verify_batch(ts, SECRET), workload)
+    jwt_tool.JWT_CACHE_SIZE = size
+    cached_cost = bench(lambda ts: jwt_verify_batch(ts, SECRET), workload)
+    total = len(workload)
+    print(f"{'impl':>10} {'total(s)':>10} {'us/token':>9}")
+    for name, cost in (("legacy", legacy_cost), ("prekeyed", prekeyed_cost), ("cached", cached_cost)):
+        print(f"{name:>10} {cost:>10.3f} {cost / total * 1e6:>9.2f}")
+    print(f"speedup: prekeyed {legacy_cost / prekeyed_cost:.1f}x, cached {legacy_cost / cached_cost:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+登录密码验证吞吐基准：进程池密码哈希服务在1/4/8个进程下的每秒登录数（对比请求线程内直接计算）
+用法：python bench/bench_pwd.py [登录次数]（无需数据库；迭代次数取PWD_HASH_ITERATIONS）
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from utils.crypto import encrypt_pwd, ITERATIONS
+from utils.password import PasswordService
+
+# 登录次数与并发请求线程数（模拟登录高峰）
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+REQUEST_THREADS = 16
+WORKER_COUNTS = (1, 4, 8)
+
+
+def run(service, encrypted):
+    """REQUEST_THREADS个请求线程并发验证LOGINS次，返回每秒登录数"""
+    with ThreadPoolExecutor(REQUEST_THREADS) as pool:
+        # 预热：启动进程池（spawn启动耗时不计入）
+        list(pool.map(lambda _: service.verify("Admin@123", encrypted), range(max(1, service.workers))))
+        start = time.perf_counter()
+        results = list(pool.map(lambda _: service.verify("Admin@123", encrypted), range(LOGINS)))
+        cost = time.perf_counter() - start
+    assert all(results)
+    return LOGINS / cost
+
+
+def main():
+    encrypted = encrypt_pwd("Admin@123")
+    print(f"PBKDF2-SHA256 {ITERATIONS} iterations, {LOGINS} logins, {REQUEST_THREADS} request threads, {os.cpu_count()} cpus")
+    print(f"{'workers':>8} {'logins/s':>10}")
+    inline = PasswordService(workers=0, max_pending=REQUEST_THREADS)
+    print(f"{'inline':>8} {run(inline, encrypted):>10.1f}")
+    for workers in WORKER_COUNTS:
+        service = PasswordService(workers=workers, max_pending=REQUEST_THREADS)
+        try:
+            print(f"{workers:>8} {run(service, encrypted):>10.1f}")
+        finally:
+            service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+路由匹配微基准：路由树Router vs 原逐条正则扫描实现
+用法：python bench/bench_router.py
+"""
+import os
+import re
+import sys
+import time
+import random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.router import Router
+
+# 每组路由数量
+ROUTE_COUNTS = [50, 500, 5000]
+# 每组匹配次数
+LOOKUPS = 20000
+
+
+class LinearRouter:
+    """原实现：按方法逐条遍历已编译正则"""
+    def __init__(self):
+        self.routes = {"GET": {}, "POST": {}, "PUT": {}, "DELETE": {}, "PATCH": {}}
+        self.param_pattern = re.compile(r"<([a-zA-Z0-9_]+)(?::([a-zA-Z0-9_]+))?>")
+
+    def add_route(self, method, path, handler):
+        regex_parts = []
+        params = []
+        for part in path.split("/"):
+            match = self.param_pattern.match(part) if part else None
+            if match:
+                params.append(match.groups())
+                regex_parts.append(r"([^/]+)")
+            else:
+                regex_parts.append(re.escape(part))
+        self.routes[method][path] = {
+            "regex": re.compile(r"^" + r"/".join(regex_parts) + r"$"),
+            "params": params,
+            "handler": handler
+        }
+
+    def match(self, method, path):
+        for route_info in self.routes[method].values():
+            match = route_info["regex"].match(path)
+            if match:
+                params = {name: match.group(idx + 1) for idx, (name, _) in enumerate(route_info["params"])}
+                return route_info["handler"], params
+        return None, {}
+
+
+def _handler(request, **kwargs):
+    return kwargs
+
+
+def build_routes(count):
+    """生成路由：一半静态（/api/mN/list），一半带参数（/api/mN/edit/<id>）"""
+    routes = []
+    for i in range(count // 2):
+        routes.append(("GET", f"/api/m{i}/list"))
+        routes.append(("PUT", f"/api/m{i}/edit/<item_id>"))
+    return routes
+
+
+def build_requests(count):
+    """生成请求路径：均匀覆盖静态/参数路由"""
+    rnd = random.Random(42)
+    requests = []
+    for _ in range(LOOKUPS):
+        i = rnd.randrange(count // 2)
+        if rnd.random() < 0.5:
+            requests.append(("GET", f"/api/m{i}/list"))
+        else:
+            requests.append(("PUT", f"/api/m{i}/edit/{rnd.randrange(100000)}"))
+    return requests
+
+
+def bench(router, requests):
+    start = time.perf_counter()
+    for method, path in requests:
+        router.match(method, path)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'routes':>8} {'linear(us/op)':>15} {'tree(us/op)':>13} {'speedup':>9}")
+    for count in ROUTE_COUNTS:
+        linear, tree = LinearRouter(), Router()
+        for method, path in build_routes(count):
+            linear.add_route(method, path, _handler)
+            tree.add_route(method, path, _handler)
+        requests = build_requests(count)
+        # 校验两种实现匹配结果一致
+        for method, path in requests[:200]:
+            route, params = tree.match(method, path)
+            assert linear.match(method, path) == (route["handler"], params)
+        linear_cost = bench(linear, requests) / LOOKUPS * 1e6
+        tree_cost = bench(tree, requests) / LOOKUPS * 1e6
+        print(f"{count:>8} {linear_cost:>15.2f} {tree_cost:>13.2f} {linear_cost / tree_cost:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,9 +21,20 @@ HOST = os.getenv("HOST", "127.0.0.1")
 PORT = int(os.getenv("PORT", 8080))
 DEBUG = os.getenv("DEBUG", "True").lower() == "true"
 SECRET_KEY = os.getenv("SECRET_KEY", "default_secret_key")
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", 10000))  # 已验证JWT缓存条目数（按Token摘要，到exp为止），0为不缓存
 HOT_RELOAD = os.getenv("HOT_RELOAD", "True").lower() == "true"
 HOT_RELOAD_INTERVAL = int(os.getenv("HOT_RELOAD_INTERVAL", 2))
 HOT_RELOAD_DIRS = [os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "apps")]
+# 服务运行模式：single-单线程HTTPServer threadpool-线程池并发处理 asyncio-asyncio事件循环 prefork-多进程
+SERVER_MODE = os.getenv("SERVER_MODE", "threadpool").lower()
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", 16))  # 工作线程数
+SERVER_QUEUE_SIZE = int(os.getenv("SERVER_QUEUE_SIZE", 128))  # 待处理连接队列上限，队满返回503
+KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", 15))  # 长连接空闲超时（秒），threadpool模式下新连接/空闲连接可读前不占用工作线程；single模式不保持长连接
+KEEPALIVE_MAX_REQUESTS = int(os.getenv("KEEPALIVE_MAX_REQUESTS", 100))  # 单个长连接最多处理的请求数
+REQUEST_READ_TIMEOUT = int(os.getenv("REQUEST_READ_TIMEOUT", 5))  # 读取请求行/请求头的超时（秒），半截请求不会长期占用工作线程
+SERVER_DRAIN_TIMEOUT = int(os.getenv("SERVER_DRAIN_TIMEOUT", 10))  # 停止服务时等待已接受连接处理完的最长时间（秒）
+PREFORK_WORKERS = int(os.getenv("PREFORK_WORKERS", os.cpu_count() or 2))  # prefork模式工作进程数
+PREFORK_REUSEPORT = os.getenv("PREFORK_REUSEPORT", "False").lower() == "true"  # 每个进程用SO_REUSEPORT各自绑定端口
 
 # PostgreSQL基础配置
 PG_HOST = os.getenv("PG_HOST", "127.0.0.1")
@@ -34,14 +45,37 @@ PG_DB = os.getenv("PG_DB", "admin_system")
 PG_CHARSET = os.getenv("PG_CHARSET", "utf8")
 # 数据库连接池-最小连接数，优先读系统环境变量 POOL_MIN_CONN，默认2
 POOL_MIN_CONN: int = int(os.getenv("POOL_MIN_CONN", 2))
-# 数据库连接池-最大连接数，优先读系统环境变量 POOL_MAX_CONN，默认10
-POOL_MAX_CONN: int = int(os.getenv("POOL_MAX_CONN", 10))
+# 数据库连接池-最大连接数，优先读系统环境变量 POOL_MAX_CONN，默认与SERVER_WORKERS相同
+# 每个工作线程处理请求期间独占一个连接（含密码校验等CPU耗时段），小于工作线程数时启动报错
+POOL_MAX_CONN: int = int(os.getenv("POOL_MAX_CONN", max(10, SERVER_WORKERS)))
 POOL_IDLE_TIMEOUT: int = int(os.getenv("POOL_IDLE_TIMEOUT", 300))  # 空闲连接超时时间
+POOL_RECYCLE: int = int(os.getenv("POOL_RECYCLE", 3600))  # 连接最大存活时间（秒），超过后借出时重建
+POOL_TIMEOUT: float = float(os.getenv("POOL_TIMEOUT", 10))  # 借出连接最长等待时间（秒）
+POOL_PRE_PING: bool = os.getenv("POOL_PRE_PING", "True").lower() == "true"  # 借出空闲较久的连接前先SELECT 1检查
+POOL_INSTANCE_NAME = "pg_default_pool"  # 默认连接池实例名
+# 写接口（POST/PUT/DELETE/PATCH）自动包裹在atomic()事务中；单个路由可用 atomic=True/False 覆盖
+ATOMIC_WRITE_ROUTES: bool = os.getenv("ATOMIC_WRITE_ROUTES", "False").lower() == "true"
+# ORM查询结果缓存（模型声明__cache_ttl__后生效）
+ORM_CACHE_ENABLED: bool = os.getenv("ORM_CACHE_ENABLED", "True").lower() == "true"
+ORM_CACHE_MAX_ENTRIES: int = int(os.getenv("ORM_CACHE_MAX_ENTRIES", 2048))  # 最大缓存条目数
+ORM_CACHE_MAX_BYTES: int = int(os.getenv("ORM_CACHE_MAX_BYTES", 32 * 1024 * 1024))  # 最大缓存字节数（估算）
+DATABASE_URL = f"postgresql://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DB}"
 # 安全配置
-CSRF_SECRET = os.getenv("CSRF_SECRET", "default_csrf_secret")
+CSRF_SECRET = os.getenv("CSRF_SECRET", "default_csrf_secret")  # CSRF Token签名密钥（所有进程/重启后一致）
+CSRF_PREVIOUS_SECRETS = [s for s in os.getenv("CSRF_PREVIOUS_SECRETS", "").split(",") if s]  # 轮换前的旧密钥（逗号分隔），其签发的Token在过期前仍有效
+CSRF_TOKEN_TTL = int(os.getenv("CSRF_TOKEN_TTL", 86400))  # CSRF Token有效期（秒）
+CSRF_ROTATE_AFTER = int(os.getenv("CSRF_ROTATE_AFTER", 3600))  # Token签发超过该秒数后，请求通过时重新签发（滑动过期）
+CSRF_BIND_CLIENT: bool = os.getenv("CSRF_BIND_CLIENT", "False").lower() == "true"  # Token是否绑定客户端IP
 RATE_LIMIT_MAX = int(os.getenv("RATE_LIMIT_MAX", 100))  # 每分钟请求数
 PASSWORD_ROUNDS = int(os.getenv("PASSWORD_ROUNDS", 12))  # bcrypt轮数
+PWD_HASH_ITERATIONS = int(os.getenv("PWD_HASH_ITERATIONS", 100000))  # PBKDF2迭代次数，调整后用户登录时自动按新次数重新哈希
+PWD_HASH_WORKERS = int(os.getenv("PWD_HASH_WORKERS", min(4, os.cpu_count() or 1)))  # 密码哈希进程数（每个服务进程），0为在请求线程内计算
+PWD_HASH_MAX_PENDING = int(os.getenv("PWD_HASH_MAX_PENDING", 16))  # 同时提交的哈希任务上限（含执行中）
+PWD_HASH_QUEUE_TIMEOUT = float(os.getenv("PWD_HASH_QUEUE_TIMEOUT", 5))  # 等待提交名额的超时（秒），超时返回服务繁忙
 DESENSITIZE_FIELDS = os.getenv("DESENSITIZE_FIELDS", "phone,email").split(",")
+AUTH_PRINCIPAL_TTL = int(os.getenv("AUTH_PRINCIPAL_TTL", 30))  # 登录用户信息（状态/角色/权限）缓存秒数，0为不缓存
+AUTH_PRINCIPAL_CACHE_SIZE = int(os.getenv("AUTH_PRINCIPAL_CACHE_SIZE", 10000))  # 登录用户信息缓存最大条目数
+PERM_INDEX_TTL = int(os.getenv("PERM_INDEX_TTL", 60))  # 角色权限索引全量重建间隔（秒），多进程部署时其他进程的变更最多延迟该时间生效
 THROTTLE_TIMEOUT = 1  # 节流超时（秒）
 DEBOUNCE_TIMEOUT = 0.5  # 防抖超时（秒）
 
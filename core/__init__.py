@@ -9,4 +9,6 @@ LastEditTime: 2026-01-25 22:19:17
 # 核心框架模块初始化
 from core.router import route, Router
 from core.orm.base import Model
+from core.orm.transaction import atomic, on_commit
+from core.orm.cache import get_cache_stats
 from core.orm.fields import IntField, StrField, BoolField, FloatField, DateTimeField, ForeignKeyField
\ No newline at end of file
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio服务引擎：事件循环自行解析连接并构造Request，复用handle_request/路由/中间件
+- 空闲长连接只占用一个协程，不占线程
+- handle_request（含ORM等阻塞调用）投递到线程池执行，不阻塞事件循环
+"""
+import io
+import asyncio
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+from core.server import handle_request, Request, Response
+from config.settings import DEBUG, STATIC_DIR, SERVER_WORKERS, KEEPALIVE_TIMEOUT, KEEPALIVE_MAX_REQUESTS
+from utils.logger import logger
+
+# 请求头最大字节数（超出返回431）
+MAX_HEADER_SIZE = 64 * 1024
+
+
+class AsyncHTTPServer:
+    """基于asyncio streams的HTTP服务"""
+    def __init__(self, host, port, workers=SERVER_WORKERS, keepalive_timeout=KEEPALIVE_TIMEOUT,
+                 max_requests=KEEPALIVE_MAX_REQUESTS):
+        self.host = host
+        self.port = port
+        self.keepalive_timeout = keepalive_timeout
+        self.max_requests = max(1, max_requests)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="aio-worker")
+        self.workers = max(1, workers)
+        self._server = None
+        # 运行统计
+        self.open_connections = 0
+        self.total_connections = 0
+        self.handled = 0
+
+    async def start(self):
+        """绑定端口，开始接收连接"""
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_SIZE
+        )
+        return self._server
+
+    async def serve_forever(self):
+        """启动并永久运行"""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        """关闭监听与线程池"""
+        if self._server is not None:
+            self._server.close()
+        self.executor.shutdown(wait=False)
+
+    def get_stats(self):
+        """获取运行统计"""
+        return {
+            "workers": self.workers,
+            "open_connections": self.open_connections,
+            "total_connections": self.total_connections,
+            "handled": self.handled
+        }
+
+    async def _send_error(self, writer, status, msg):
+        """发送错误响应（随后关闭连接）"""
+        response = Response()
+        response.json({"code": status, "msg": msg}, status)
+        writer.write(response.build())
+        await writer.drain()
+
+    @staticmethod
+    def _want_keep_alive(version, headers):
+        """客户端是否希望保持连接：HTTP/1.1默认保持，HTTP/1.0需显式keep-alive"""
+        connection = (headers.get("Connection") or "").lower()
+        if version == "HTTP/1.1":
+            return connection != "close"
+        return connection == "keep-alive"
+
+    async def _write_response(self, writer, response, keep_alive, chunked):
+        """发送响应：普通响应一次写出；流式响应在线程池中逐块生成（可能涉及数据库读取）"""
+        loop = asyncio.get_running_loop()
+        if response.body_iter is None:
+            writer.write(response.build(keep_alive))
+            await writer.drain()
+            return
+        chunks = response.iter_bytes(keep_alive, chunked)
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+                if chunk is None:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+        finally:
+            await loop.run_in_executor(self.executor, response.close)
+
+    async def _handle_connection(self, reader, writer):
+        """单个连接：循环读取请求（长连接），逐个交给handle_request处理"""
+        peer = writer.get_extra_info("peername")
+        client_addr = tuple(peer[:2]) if peer else ("", 0)
+        self.open_connections += 1
+        self.total_connections += 1
+        loop = asyncio.get_running_loop()
+        requests_served = 0
+        try:
+            while True:
+                # 1. 读取请求行+请求头（空闲超时则关闭连接）
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send_error(writer, 431, "Request header too large")
+                    break
+
+                request_line, _, header_block = head.partition(b"\r\n")
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    await self._send_error(writer, 400, "Bad request line")
+                    break
+                method, target, version = parts
+                headers = http.client.parse_headers(io.BytesIO(header_block))
+
+                # 2. 读取请求体（仅支持Content-Length）
+                if headers.get("Transfer-Encoding"):
+                    await self._send_error(writer, 411, "Content-Length required")
+                    break
+                try:
+                    content_length = int(headers.get("Content-Length", 0))
+                    if content_length < 0:
+                        raise ValueError(content_length)
+                except ValueError:
+                    await self._send_error(writer, 400, "Invalid Content-Length")
+                    break
+                try:
+                    body = await reader.readexactly(content_length) if content_length > 0 else b""
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                # 3. 阻塞处理逻辑投递到线程池
+                request = Request(method, target, headers, body, client_addr)
+                response = await loop.run_in_executor(self.executor, handle_request, request)
+
+                # 4. 判断是否保持连接（客户端意愿 + 单连接请求数上限），按序写回响应
+                requests_served += 1
+                chunked = version == "HTTP/1.1"
+                keep_alive = self._want_keep_alive(version, headers) and requests_served < self.max_requests
+                if response.body_iter is not None and not chunked:
+                    keep_alive = False
+                await self._write_response(writer, response, keep_alive, chunked)
+                self.handled += 1
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        except Exception as e:
+            logger.error(f"[AioServer] Connection {client_addr} error: {str(e)}", exc_info=True)
+        finally:
+            self.open_connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+def run_async_server(host, port):
+    """启动asyncio服务（与run_http_server调用方式一致）"""
+    server = AsyncHTTPServer(host, port)
+    try:
+        logger.info(f"[AioServer] asyncio server running on http://{host}:{port}")
+        logger.info(f"[AioServer] Debug mode: {DEBUG}, Static dir: {STATIC_DIR}")
+        logger.info(f"[AioServer] Executor workers: {server.workers}, keep-alive timeout: {server.keepalive_timeout}s")
+        logger.info(f"[AioServer] Press CTRL+C to stop server")
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("[AioServer] Server stopping by user (CTRL+C)")
+    except Exception as e:
+        logger.error(f"[AioServer] Server start error: {str(e)}", exc_info=True)
+    finally:
+        server.close()
+        logger.info(f"[AioServer] Server stopped, stats: {server.get_stats()}")
+
+
+# 测试：直接运行该文件启动服务
+if __name__ == "__main__":
+    from config.settings import HOST, PORT
+    run_async_server(HOST, PORT)
@@ -1,6 +1,8 @@
 # 中间件模块初始化
+from core.middleware.chain import applies_when, build_chain
 from core.middleware.csrf import csrf_middleware
 from core.middleware.rate_limit import rate_limit_middleware
 from core.middleware.throttle_debounce import throttle_middleware, debounce_middleware
 from core.middleware.auth import auth_middleware
+from core.middleware.permission import permission_middleware
 from core.middleware.desensitize import desensitize_middleware
\ No newline at end of file
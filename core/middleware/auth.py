@@ -2,22 +2,93 @@
 # -*- coding: utf-8 -*-
 """
 权限认证中间件：替换jwt.decode为自定义jwt_decode
+- 登录用户信息（状态、角色ID、is_admin）按用户ID缓存AUTH_PRINCIPAL_TTL秒，命中时认证不查库
+- 权限标识取自角色权限索引（apps.permission.engine），不随用户缓存
+- 用户/角色变更后由对应接口以 on_commit(...) 调用 evict_principal()/evict_role_principals()，事务提交后立即失效
+- 多进程部署时各进程缓存独立，其他进程最多在TTL后看到变更
 """
 import time
+import threading
+from collections import OrderedDict
 # from core.response import Response
 # 导入自定义JWT工具（替换原有jwt库）
 from utils.jwt_tool import jwt_decode
-from config.settings import SECRET_KEY
+from utils.logger import logger
+from config.settings import SECRET_KEY, AUTH_PRINCIPAL_TTL, AUTH_PRINCIPAL_CACHE_SIZE
+from core.middleware.chain import applies_when
 
+# 接口白名单：无需登录的接口（静态文件/前端页面不经过中间件）
+AUTH_WHITE_LIST = ("/api/user/login",)
+
+# 登录用户信息缓存 {user_id: (principal, 过期时间)}，右端为最近使用
+_principals = OrderedDict()
+_principals_lock = threading.Lock()
+# 缓存失效代数：每次evict加1；查库期间发生过失效时，查到的结果可能是旧数据，不写入缓存
+_generation = 0
+
+
+def _load_principal(user_id):
+    """查库构造登录用户信息：用户+角色一条JOIN"""
+    from apps.user.models import User
+    user = User.where(id=user_id).select_related("role_id").first()
+    if not user:
+        return None
+    role = user.role_id
+    return {
+        "id": user.id,
+        "username": user.username,
+        "status": user.status,
+        "role_id": role.id if role else None,
+        "is_admin": bool(role and role.is_admin == 1)
+    }
+
+
+def get_principal(user_id):
+    """获取登录用户信息（优先读缓存），用户不存在返回None"""
+    now = time.time()
+    with _principals_lock:
+        entry = _principals.get(user_id)
+        if entry is not None:
+            if entry[1] > now:
+                _principals.move_to_end(user_id)
+                return entry[0]
+            del _principals[user_id]
+        generation = _generation
+    principal = _load_principal(user_id)
+    if principal is not None and AUTH_PRINCIPAL_TTL > 0:
+        with _principals_lock:
+            if generation != _generation:
+                return principal
+            _principals[user_id] = (principal, now + AUTH_PRINCIPAL_TTL)
+            _principals.move_to_end(user_id)
+            while len(_principals) > AUTH_PRINCIPAL_CACHE_SIZE:
+                _principals.popitem(last=False)
+    return principal
+
+
+def evict_principal(user_id):
+    """用户信息变更（编辑/删除）后清除其缓存"""
+    global _generation
+    with _principals_lock:
+        _generation += 1
+        _principals.pop(user_id, None)
+
+
+def evict_role_principals(role_id):
+    """角色信息或权限变更后清除该角色下所有用户的缓存"""
+    global _generation
+    with _principals_lock:
+        _generation += 1
+        for user_id in [uid for uid, (principal, _) in _principals.items() if principal["role_id"] == role_id]:
+            del _principals[user_id]
+
+
+@applies_when(lambda route: route["path"] not in AUTH_WHITE_LIST)
 def auth_middleware(request, response):
     """
     权限认证中间件：从Header获取Token，解析验证后挂载用户信息到request.user
     """
-    # 1. 接口白名单：无需登录的接口（保留原有配置）
-    white_list = ["/api/user/login", "/static/*", "/", "/pages/login.html"]
-    if request.path in white_list or (request.path.startswith("/static/")):
-        return None
-    
+    # 1. 白名单接口在注册路由时已排除，不会执行到这里
     # 2. 从Request Header获取Token（保留原有逻辑）
     token = None
     auth_header = request.headers.get("Authorization")
@@ -36,20 +107,21 @@ def auth_middleware(request, response):
         logger.error(f"[Auth] Token verify failed: {str(e)}")
         return response.json({"code": 401, "msg": str(e) or "登录状态无效，请重新登录"}, 401)
     
-    # 4. 挂载用户信息到request.user（保留原有逻辑，可按需扩展字段）
+    # 4. 获取登录用户信息（缓存命中时不查库），用户已删除或被禁用时拒绝
+    principal = get_principal(payload.get("user_id"))
+    if principal is None or principal["status"] == 0:
+        logger.warning(f"[Auth] Inactive user rejected: {payload.get('user_id')}")
+        return response.json({"code": 401, "msg": "用户不存在或已被禁用"}, 401)
+    
+    # 5. 挂载用户信息到request.user（权限标识从角色权限索引读取，O(1)）
+    from apps.permission.engine import permission_index
     request.user = {
-        "id": payload.get("user_id"),
-        "username": payload.get("username"),
-        "is_admin": False  # 可从数据库查询角色补充，原有逻辑不变
+        "id": principal["id"],
+        "username": principal["username"],
+        "role_id": principal["role_id"],
+        "is_admin": principal["is_admin"],
+        "perms": frozenset(("*",)) if principal["is_admin"] else permission_index.codes_for(principal["role_id"])
     }
-    # 可选：补充管理员标识（原有逻辑不变）
-    from apps.role.models import Role
-    from apps.user.models import User
-    user = User.get(id=payload.get("user_id"))
-    if user:
-        role = Role.get(id=user.role_id)
-        request.user["is_admin"] = role.is_admin == 1 if role else False
-    
     return None
 
-# 其他中间件（限流/CSRF/脱敏等）：完全保留，无需修改
\ No newline at end of file
+# 其他中间件（限流/CSRF/脱敏等）：完全保留，无需修改__init__.py
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中间件链预编译：中间件声明适用条件，路由注册时为每个路由计算出扁平的中间件列表，
+请求时直接按列表执行，不再逐个判断白名单
+"""
+
+
+def applies_when(predicate):
+    """
+    声明中间件的适用条件（注册路由时求值，不在请求时执行）
+    :param predicate: predicate(route) -> bool，route为路由信息字典（method/path/params/options等）
+    """
+    def decorator(middleware):
+        middleware.applies_to = predicate
+        return middleware
+    return decorator
+
+
+def _middleware_name(middleware):
+    return getattr(middleware, "__name__", repr(middleware))
+
+
+def build_chain(middlewares, route):
+    """
+    计算单个路由的中间件链：全局中间件 + 路由额外声明的中间件，
+    去掉路由skip的（函数或函数名），再按中间件声明的适用条件过滤
+    """
+    skip = route.get("skip") or ()
+    chain = []
+    for middleware in list(middlewares) + list(route.get("middlewares") or ()):
+        if middleware in skip or _middleware_name(middleware) in skip:
+            continue
+        predicate = getattr(middleware, "applies_to", None)
+        if predicate is not None and not predicate(route):
+            continue
+        if middleware not in chain:
+            chain.append(middleware)
+    return chain
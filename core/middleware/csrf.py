@@ -8,58 +8,87 @@ LastEditTime: 2026-01-25 19:27:38
 '''
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import uuid
+"""
+CSRF防护中间件：无状态签名Token，不在内存中保存已签发的Token
+- Token格式：随机数.签发时间.签名，签名为HMAC-SHA256(CSRF_SECRET, 随机数.签发时间[.客户端IP])
+- 校验只做签名与时间检查，任意进程/重启后均可验证，内存占用不随请求增长
+- 密钥轮换：新Token用CSRF_SECRET签名，CSRF_PREVIOUS_SECRETS中的旧密钥签发的Token过期前仍有效
+- 过期：签发超过CSRF_TOKEN_TTL秒失效；超过CSRF_ROTATE_AFTER秒的有效Token在请求通过时重新签发
+"""
+import hmac
 import time
-from config.settings import CSRF_SECRET
+import hashlib
+import secrets
+from base64 import urlsafe_b64encode
+from config.settings import (
+    CSRF_SECRET, CSRF_PREVIOUS_SECRETS, CSRF_TOKEN_TTL, CSRF_ROTATE_AFTER, CSRF_BIND_CLIENT
+)
 from utils.logger import logger
 
-# 存储CSRF Token {token: (create_time, client_addr)}
-_csrf_tokens = {}
-# 清理过期Token的时间间隔（秒）
-_CLEAN_INTERVAL = 3600
-_last_clean_time = time.time()
+# 预先生成的HMAC对象（使用时copy），第一个用于签发，其余仅用于验证
+_SIGNERS = [hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+            for secret in [CSRF_SECRET] + CSRF_PREVIOUS_SECRETS]
+# 允许的时钟偏差（秒）：多台机器部署时签发时间可能略超前
+_CLOCK_SKEW = 60
 
-def _generate_csrf_token():
+
+def _client_id(request):
+    """Token绑定的客户端标识（未开启绑定时为空）"""
+    return request.client_addr[0] if CSRF_BIND_CLIENT and request.client_addr else ""
+
+
+def _sign(signer, nonce, issued_at, client_id):
+    mac = signer.copy()
+    mac.update(f"{nonce}.{issued_at}.{client_id}".encode("utf-8"))
+    return urlsafe_b64encode(mac.digest()).decode("ascii").rstrip("=")
+
+
+def _generate_csrf_token(request):
     """生成CSRF Token"""
-    return str(uuid.uuid4()) + "_" + CSRF_SECRET[:16]
-
-def _clean_expired_tokens():
-    """清理过期Token（有效期24小时）"""
-    global _last_clean_time
-    if time.time() - _last_clean_time < _CLEAN_INTERVAL:
-        return
-    now = time.time()
-    expired = [t for t, (ct, _) in _csrf_tokens.items() if now - ct > 86400]
-    for t in expired:
-        del _csrf_tokens[t]
-    _last_clean_time = time.time()
-    logger.debug(f"[CSRF] Clean {len(expired)} expired tokens, remaining: {len(_csrf_tokens)}")
+    nonce = secrets.token_urlsafe(16)
+    issued_at = int(time.time())
+    return f"{nonce}.{issued_at}.{_sign(_SIGNERS[0], nonce, issued_at, _client_id(request))}"
+
+
+def _token_age(request, token):
+    """校验Token签名与有效期，有效返回已签发秒数，无效返回None"""
+    try:
+        nonce, issued_at, signature = token.split(".")
+        issued_at = int(issued_at)
+    except ValueError:
+        return None
+    age = time.time() - issued_at
+    if age > CSRF_TOKEN_TTL or age < -_CLOCK_SKEW:
+        return None
+    client_id = _client_id(request)
+    for signer in _SIGNERS:
+        if hmac.compare_digest(_sign(signer, nonce, issued_at, client_id), signature):
+            return age
+    return None
+
+
+def _issue(request, response):
+    response.set_cookie("X-CSRF-Token", _generate_csrf_token(request), max_age=CSRF_TOKEN_TTL)
+
 
 def csrf_middleware(request, response):
     """CSRF防护中间件：验证Token，非GET请求必须携带"""
-    # 清理过期Token
-    _clean_expired_tokens()
+    token = request.csrf_token
+    age = _token_age(request, token) if token else None
 
     # 白名单：GET/OPTIONS请求不验证CSRF
     if request.method in ["GET", "OPTIONS"]:
-        # 没有Token则生成并设置
-        if not request.csrf_token or request.csrf_token not in _csrf_tokens:
-            new_token = _generate_csrf_token()
-            _csrf_tokens[new_token] = (time.time(), request.client_addr)
-            response.set_cookie("X-CSRF-Token", new_token, max_age=86400)
+        # 没有有效Token或Token需轮换则重新签发
+        if age is None or age > CSRF_ROTATE_AFTER:
+            _issue(request, response)
         return None
 
     # 非GET请求验证Token
-    if not request.csrf_token or request.csrf_token not in _csrf_tokens:
+    if age is None:
         logger.warning(f"[CSRF] Invalid token from {request.client_addr}, path: {request.path}")
         return response.json({"code": 403, "msg": "CSRF token invalid or missing"}, 403)
 
-    # 验证Token归属（可选：严格验证客户端地址）
-    token_ct, token_addr = _csrf_tokens[request.csrf_token]
-    # if token_addr != request.client_addr:
-    #     logger.warning(f"[CSRF] Token mismatch from {request.client_addr}, path: {request.path}")
-    #     return response.json({"code": 403, "msg": "CSRF token mismatch"}, 403)
-
-    # 刷新Token过期时间
-    _csrf_tokens[request.csrf_token] = (time.time(), request.client_addr)
-    return None
\ No newline at end of file
+    # 刷新Token（滑动过期）
+    if age > CSRF_ROTATE_AFTER:
+        _issue(request, response)
+    return None
@@ -3,14 +3,14 @@
 import json
 from config.settings import DESENSITIZE_FIELDS
 from utils.logger import logger
+from core.middleware.chain import applies_when
 
+# 白名单：忽略登录、令牌相关接口（注册路由时排除）
+NO_DESENSITIZE_PATHS = ("/api/user/login", "/api/user/info", "/api/user/refresh")
+
+@applies_when(lambda route: route["path"] not in NO_DESENSITIZE_PATHS)
 def desensitize_middleware(request, response):
     """敏感数据脱敏中间件：对响应中的指定字段进行脱敏"""
-    # 白名单：忽略登录、令牌相关接口
-    no_desensitize_paths = ["/api/user/login", "/api/user/info", "/api/user/refresh"]
-    if request.path in no_desensitize_paths:
-        return None
-
     # 仅对JSON响应生效
     if "application/json" not in response.headers.get("Content-Type", ""):
         return None
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接口权限中间件：路由声明 perm="权限标识" 时校验当前用户角色是否拥有该权限
+- 用法：@post("/api/user/add", perm="user:add")
+- 须在auth_middleware之后执行（依赖request.user）；超级管理员直接放行
+- 鉴权查询角色权限索引（apps.permission.engine），不访问数据库
+"""
+from utils.logger import logger
+from core.middleware.chain import applies_when
+
+
+@applies_when(lambda route: bool(route["options"].get("perm")))
+def permission_middleware(request, response):
+    """接口权限校验：无权限返回403"""
+    from apps.permission.engine import permission_index
+    user = request.user
+    if user is None:
+        return response.json({"code": 401, "msg": "未登录，请先登录"}, 401)
+    if user.get("is_admin"):
+        return None
+    perm = request.route["options"]["perm"]
+    if not permission_index.has_perm(user.get("role_id"), perm):
+        logger.warning(f"[Permission] Access denied: user {user.get('username')}, perm {perm}, path {request.path}")
+        return response.json({"code": 403, "msg": "无权限访问"}, 403)
+    return None
@@ -12,6 +12,7 @@ import time
 from collections import defaultdict
 from config.settings import THROTTLE_TIMEOUT, DEBOUNCE_TIMEOUT
 from utils.logger import logger
+from core.middleware.chain import applies_when
 
 # 节流存储 {client_addr+path: last_request_time}
 _throttle_storage = dict()
@@ -21,11 +22,7 @@ _debounce_storage = dict()
 _debounce_timers = dict()
 
 def throttle_middleware(request, response):
-    """请求节流中间件：指定时间内同一接口仅允许一次请求"""
-    # 白名单：忽略静态文件和OPTIONS
-    if request.path.startswith("/static/") or request.method == "OPTIONS":
-        return None
-    
+    """请求节流中间件：指定时间内同一接口仅允许一次请求（静态文件和OPTIONS不经过中间件）"""
     key = f"{request.client_addr[0]}_{request.path}_{request.method}"
     now = time.time()
     last_time = _throttle_storage.get(key, 0)
@@ -45,12 +42,9 @@ def throttle_middleware(request, response):
             del _throttle_storage[k]
     return None
 
+@applies_when(lambda route: route["method"] in ("POST", "PUT", "DELETE"))
 def debounce_middleware(request, response):
-    """请求防抖中间件：指定时间内多次请求仅执行最后一次（简化实现，同步版）"""
-    # 白名单：仅对POST/PUT/DELETE生效，忽略静态文件
-    if request.method not in ["POST", "PUT", "DELETE"] or request.path.startswith("/static/"):
-        return None
-    
+    """请求防抖中间件：指定时间内多次请求仅执行最后一次（简化实现，同步版；仅对POST/PUT/DELETE路由生效）"""
     key = f"{request.client_addr[0]}_{request.path}_{request.method}"
     now = time.time()
     debounce_info = _debounce_storage.get(key, (0, None))
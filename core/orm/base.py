@@ -1,14 +1,25 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import datetime
+from psycopg2.extras import execute_values, execute_batch
 from core.orm.pool import get_db_pool
-# from config.settings import POOL_INSTANCE_NAME
+from core.orm.context import current_scope
+from core.orm.query import Query
+from core.orm.transaction import atomic
+from core.orm.cache import table_changed
+from config.settings import POOL_INSTANCE_NAME
 from utils.logger import logger
 
 class Field:
     """ORM字段基类"""
+    # 读取时是否需要转换类型（psycopg2已返回对应Python类型的字段无需转换，投影查询据此跳过）
+    convert_on_read = False
+    # 是否为关联字段（外键）
+    is_relation = False
+
     def __init__(self, primary_key=False, default=None, nullable=True, unique=False, comment=""):
         self.name = None  # 字段名（由Model元类设置）
+        self.attname = None  # 实例上存储原始值的属性名（由Model元类设置）
         self.model = None  # 所属模型（由Model元类设置）
         self.primary_key = primary_key
         self.default = default
@@ -16,6 +27,10 @@ class Field:
         self.unique = unique
         self.comment = comment
 
+    def get_attname(self):
+        """实例上存储原始值的属性名（普通字段即字段名）"""
+        return self.name
+
     def get_default(self):
         """获取字段默认值"""
         if callable(self.default):
@@ -42,50 +57,100 @@ class Field:
         """子类实现具体转换"""
         return value
 
+def _compile_hydrator(model, columns):
+    """
+    生成指定模型+列顺序的行转实例函数：
+    - object.__new__ 直接建实例，不走__init__（不计算默认值）
+    - 按列下标直接取值写入槽位，仅 convert_on_read 字段做类型转换
+    - 未查询的字段置None，同时记录原始值快照用于脏字段判断
+    """
+    index = {name: idx for idx, name in enumerate(columns)}
+    namespace = {"new": object.__new__, "cls": model}
+    lines = ["def hydrate(row):", "    obj = new(cls)"]
+    originals = []
+    for num, (name, field) in enumerate(model._meta["fields"].items()):
+        var = f"v{num}"
+        if name in index:
+            lines.append(f"    {var} = row[{index[name]}]")
+            if field.convert_on_read:
+                namespace[f"convert{num}"] = field._from_db
+                lines.append(f"    if {var} is not None: {var} = convert{num}({var})")
+        else:
+            lines.append(f"    {var} = None")
+        lines.append(f"    obj.{field.attname} = {var}")
+        if field.is_relation:
+            lines.append(f"    obj.{field.cache_name} = None")
+        originals.append(var)
+    lines.append(f"    obj._original = ({', '.join(originals)},)")
+    lines.append("    return obj")
+    exec("\n".join(lines), namespace)
+    return namespace["hydrate"]
+
 class ModelMeta(type):
-    """Model元类：自动收集字段，生成表结构相关信息"""
+    """
+    Model元类：自动收集字段，生成表结构相关信息
+    - 普通字段从类属性移入_meta，实例以__slots__存储字段值（外键保留描述符，原始值存于 xxx_id 槽位）
+    - 按列顺序缓存编译好的行转实例函数（见_compile_hydrator）
+    """
     def __new__(cls, name, bases, attrs):
         # 跳过基类Model本身
         if name == "Model":
             return super().__new__(cls, name, bases, attrs)
-        
-        new_cls = super().__new__(cls, name, bases, attrs)
-        new_cls._meta = {
-            "table_name": attrs.get("__table_name__", name.lower()),  # 表名（默认类名小写）
-            "fields": {},  # 所有字段 {字段名: 字段实例}
-            "primary_key": None  # 主键字段
-        }
 
         # 收集所有字段
-        for attr_name, attr_value in attrs.items():
+        fields = {}
+        primary_key = None
+        for attr_name, attr_value in list(attrs.items()):
             if isinstance(attr_value, Field):
-                # 设置字段名和所属模型
+                # 设置字段名
                 attr_value.name = attr_name
-                attr_value.model = new_cls
-                new_cls._meta["fields"][attr_name] = attr_value
+                attr_value.attname = attr_value.get_attname()
+                fields[attr_name] = attr_value
+                # 普通字段不保留类属性（与槽位同名会冲突），外键保留描述符
+                if not attr_value.is_relation:
+                    del attrs[attr_name]
                 # 标记主键
                 if attr_value.primary_key:
-                    if new_cls._meta["primary_key"] is not None:
+                    if primary_key is not None:
                         raise ValueError(f"Model {name} can only have one primary key")
-                    new_cls._meta["primary_key"] = attr_name
+                    primary_key = attr_name
 
         # 检查主键
-        if new_cls._meta["primary_key"] is None:
+        if primary_key is None:
             raise ValueError(f"Model {name} must have a primary key field")
+
+        slots = [field.attname for field in fields.values()]
+        slots += [field.cache_name for field in fields.values() if field.is_relation]
+        attrs["__slots__"] = tuple(slots)
+        new_cls = super().__new__(cls, name, bases, attrs)
+        for field in fields.values():
+            field.model = new_cls
+        new_cls._meta = {
+            "table_name": attrs.get("__table_name__", name.lower()),  # 表名（默认类名小写）
+            "fields": fields,  # 所有字段 {字段名: 字段实例}
+            "primary_key": primary_key,  # 主键字段
+            "cache_ttl": attrs.get("__cache_ttl__", 0),  # 查询缓存TTL（秒），0为不缓存
+            "hydrators": {}  # 行转实例函数 {列名元组: 函数}
+        }
         
-        logger.debug(f"[ORM] Initialize model {name}, table: {new_cls._meta['table_name']}, fields: {list(new_cls._meta['fields'].keys())}")
+        logger.debug(f"[ORM] Initialize model {name}, table: {new_cls._meta['table_name']}, fields: {list(fields.keys())}")
         return new_cls
 
 class Model(metaclass=ModelMeta):
     """ORM模型基类：提供CRUD核心方法"""
     __table_name__ = None  # 自定义表名（可选）
+    __cache_ttl__ = 0  # 查询结果缓存秒数（可选，见core.orm.cache）
+    __slots__ = ("_original",)  # 字段原始值快照（按字段顺序，新建实例为空元组）
+    # 事务：with Model.atomic(): ...（见core.orm.transaction）
+    atomic = staticmethod(atomic)
 
     def __init__(self, **kwargs):
-        """初始化模型实例：给字段赋值"""
-        self._dirty_fields = set()  # 脏字段（已修改未保存）
-        meta = self._meta
-        for field_name, field in meta["fields"].items():
-            value = kwargs.get(field_name, field.get_default())
+        """初始化模型实例：给字段赋值（未传入的字段取默认值）"""
+        self._original = ()
+        for field_name, field in self._meta["fields"].items():
+            if field.is_relation:
+                setattr(self, field.cache_name, None)
+            value = kwargs[field_name] if field_name in kwargs else field.get_default()
             setattr(self, field_name, value)
 
     def __repr__(self):
@@ -98,143 +163,215 @@ class Model(metaclass=ModelMeta):
         """获取主键值"""
         return getattr(self, self._meta["primary_key"])
 
-    def _mark_dirty(self, field_name):
-        """标记字段为脏字段"""
-        self._dirty_fields.add(field_name)
-
-    def __setattr__(self, name, value):
-        """重写赋值：自动标记脏字段"""
-        if name in self._meta["fields"] and hasattr(self, name) and getattr(self, name) != value:
-            self._mark_dirty(name)
-        super().__setattr__(name, value)
+    @property
+    def _dirty_fields(self):
+        """脏字段（与快照不同的字段；未从数据库加载的实例为全部非主键字段）"""
+        fields = self._meta["fields"]
+        if not self._original:
+            pk = self._meta["primary_key"]
+            return [name for name in fields if name != pk]
+        return [
+            name for (name, field), old in zip(fields.items(), self._original)
+            if getattr(self, field.attname) != old
+        ]
+
+    def _snapshot(self, field_names=None):
+        """记录当前值为原始值；field_names指定时只更新这些字段"""
+        fields = self._meta["fields"]
+        if field_names is None or not self._original:
+            self._original = tuple(getattr(self, field.attname) for field in fields.values())
+            return
+        field_names = set(field_names)
+        self._original = tuple(
+            getattr(self, field.attname) if name in field_names else old
+            for (name, field), old in zip(fields.items(), self._original)
+        )
 
     @classmethod
     def _get_cursor(cls):
-        """获取数据库游标（从连接池）"""
-        pool = get_db_pool(POOL_INSTANCE_NAME)
-        conn = pool.get_connection()
+        """获取数据库游标：请求作用域内复用同一连接，否则从连接池借出"""
+        scope = current_scope()
+        if scope is not None:
+            conn = scope.connection()
+        else:
+            conn = get_db_pool(POOL_INSTANCE_NAME).get_connection()
         cursor = conn.cursor()
         return conn, cursor
 
     @classmethod
     def _release_cursor(cls, conn, cursor, commit=False):
-        """释放游标和连接"""
+        """
+        释放游标，提交（可选）；作用域连接留待请求结束归还，其他连接立即归还连接池
+        atomic()事务内不提交也不回滚，由事务结束时统一处理
+        """
+        scope = current_scope()
+        scoped = scope is not None and scope.owns(conn)
+        in_transaction = scoped and scope.atomic_depth > 0
+        discard = False
         try:
             cursor.close()
-            if commit:
+            if commit and not in_transaction:
                 conn.commit()
         except Exception as e:
-            conn.rollback()
+            if not in_transaction:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+                    if scoped:
+                        scope.broken = True
             logger.error(f"[ORM] Database operation error: {str(e)}", exc_info=True)
             raise
         finally:
-            conn.close()
+            if not scoped:
+                get_db_pool(POOL_INSTANCE_NAME).release(conn, discard=discard)
+            elif not in_transaction:
+                scope.reset_if_failed(conn)
+            if commit:
+                # 写操作：使该表的查询缓存失效
+                table_changed(cls._meta["table_name"])
+
+    @classmethod
+    def _get_hydrator(cls, columns):
+        """获取（必要时编译）指定列顺序的行转实例函数"""
+        columns = tuple(columns)
+        hydrators = cls._meta["hydrators"]
+        hydrate = hydrators.get(columns)
+        if hydrate is None:
+            hydrate = hydrators[columns] = _compile_hydrator(cls, columns)
+        return hydrate
+
+    @classmethod
+    def _from_row(cls, columns, row):
+        """数据库行转模型实例"""
+        return cls._get_hydrator(columns)(row)
+
+    @classmethod
+    def where(cls, **kwargs):
+        """构造查询（支持 字段__查询类型=值，见core.orm.query）"""
+        return Query(cls, kwargs)
+
+    @classmethod
+    def select_related(cls, *relations):
+        """构造联表加载外键实例的查询"""
+        return Query(cls).select_related(*relations)
+
+    @classmethod
+    def prefetch_related(cls, *lookups):
+        """构造批量预加载外键实例的查询"""
+        return Query(cls).prefetch_related(*lookups)
 
     @classmethod
     def get(cls, **kwargs):
         """根据条件获取单条记录"""
         if not kwargs:
             raise ValueError("get() requires at least one condition")
-        
-        # 构建查询条件
-        where_clause = " AND ".join([f"{k} = %s" for k in kwargs.keys()])
-        params = [cls._meta["fields"][k].to_db_value(v) for k, v in kwargs.items()]
-        sql = f"SELECT * FROM {cls._meta['table_name']} WHERE {where_clause} LIMIT 1"
-
-        conn, cursor = cls._get_cursor()
-        try:
-            cursor.execute(sql, params)
-            result = cursor.fetchone()
-            if not result:
-                return None
-            # 获取字段名列表
-            fields = [desc[0] for desc in cursor.description]
-            # 转换为模型实例
-            data = dict(zip(fields, result))
-            instance = cls()
-            for field_name, field in cls._meta["fields"].items():
-                setattr(instance, field_name, field.from_db_value(data.get(field_name)))
-            instance._dirty_fields.clear()  # 新实例无脏字段
-            return instance
-        finally:
-            cls._release_cursor(conn, cursor)
+        return cls.where(**kwargs).first()
 
     @classmethod
     def filter(cls, **kwargs):
-        """根据条件获取多条记录（支持简单条件）"""
-        where_clause = "1=1"
-        params = []
-        if kwargs:
-            where_clause = " AND ".join([f"{k} = %s" for k in kwargs.keys()])
-            params = [cls._meta["fields"][k].to_db_value(v) for k, v in kwargs.items()]
-        sql = f"SELECT * FROM {cls._meta['table_name']} WHERE {where_clause}"
+        """根据条件获取多条记录（支持 __in/__like/__gt/__isnull 等查询类型）"""
+        return cls.where(**kwargs).all()
+
+    @classmethod
+    def paginate(cls, page=1, page_size=10, **kwargs):
+        """分页查询"""
+        return cls.where(**kwargs).paginate(page, page_size)
+
+    @classmethod
+    def values(cls, *fields, **kwargs):
+        """投影查询：返回指定字段的字典列表"""
+        return cls.where(**kwargs).values(*fields)
+
+    @classmethod
+    def values_list(cls, *fields, flat=False, **kwargs):
+        """投影查询：返回指定字段的元组列表"""
+        return cls.where(**kwargs).values_list(*fields, flat=flat)
+
+    @classmethod
+    def paginate_keyset(cls, cursor=None, page_size=10, order_by=None, with_total=False, **kwargs):
+        """游标分页（order_by为排序字段元组，默认按主键）"""
+        query = cls.where(**kwargs)
+        if order_by:
+            query = query.order_by(*order_by)
+        return query.paginate_keyset(cursor, page_size, with_total)
+
+    @classmethod
+    def count(cls, **kwargs):
+        """统计记录数"""
+        return cls.where(**kwargs).count()
+
+    @classmethod
+    def exists(cls, **kwargs):
+        """是否存在匹配记录"""
+        return cls.where(**kwargs).exists()
+
+    @classmethod
+    def count_by(cls, field_name, **kwargs):
+        """按字段分组计数，返回 {字段值: 数量}"""
+        return cls.where(**kwargs).count_by(field_name)
+
+    @classmethod
+    def bulk_create(cls, instances, batch_size=500):
+        """
+        批量新增：每批一条多行 INSERT ... VALUES ... RETURNING 主键，全部批次一次提交
+        :return: 已回填主键的实例列表
+        """
+        instances = list(instances)
+        if not instances:
+            return instances
+        meta = cls._meta
+        pk_name = meta["primary_key"]
+        fields = [f for f in meta["fields"] if f != pk_name]
+        sql = f"INSERT INTO {meta['table_name']} ({', '.join(fields)}) VALUES %s RETURNING {pk_name}"
 
         conn, cursor = cls._get_cursor()
         try:
-            cursor.execute(sql, params)
-            results = cursor.fetchall()
-            fields = [desc[0] for desc in cursor.description]
-            instances = []
-            for row in results:
-                data = dict(zip(fields, row))
-                instance = cls()
-                for field_name, field in cls._meta["fields"].items():
-                    setattr(instance, field_name, field.from_db_value(data.get(field_name)))
-                instance._dirty_fields.clear()
-                instances.append(instance)
+            for start in range(0, len(instances), batch_size):
+                batch = instances[start:start + batch_size]
+                rows = [[meta["fields"][f].to_db_value(getattr(obj, meta["fields"][f].attname)) for f in fields] for obj in batch]
+                pk_rows = execute_values(cursor, sql, rows, page_size=batch_size, fetch=True)
+                for obj, (pk_value,) in zip(batch, pk_rows):
+                    setattr(obj, pk_name, meta["fields"][pk_name].from_db_value(pk_value))
+                    obj._snapshot()
+            logger.debug(f"[ORM] Bulk insert {len(instances)} {cls.__name__} success")
             return instances
         finally:
-            cls._release_cursor(conn, cursor)
+            cls._release_cursor(conn, cursor, commit=True)
 
     @classmethod
-    def paginate(cls, page=1, page_size=10, **kwargs):
-        """分页查询"""
-        if page < 1:
-            page = 1
-        offset = (page - 1) * page_size
-
-        # 总数查询
-        count_where = "1=1"
-        count_params = []
-        if kwargs:
-            count_where = " AND ".join([f"{k} = %s" for k in kwargs.keys()])
-            count_params = [cls._meta["fields"][k].to_db_value(v) for k, v in kwargs.items()]
-        count_sql = f"SELECT COUNT(*) FROM {cls._meta['table_name']} WHERE {count_where}"
-
-        # 列表查询
-        list_where = count_where
-        list_params = count_params.copy()
-        list_sql = f"SELECT * FROM {cls._meta['table_name']} WHERE {list_where} LIMIT %s OFFSET %s"
-        list_params.extend([page_size, offset])
+    def bulk_update(cls, instances, fields, batch_size=500):
+        """
+        批量更新指定字段：按主键逐行UPDATE，每batch_size条合并为一次网络往返，全部一次提交
+        :return: 影响行数
+        """
+        instances = list(instances)
+        if not instances:
+            return 0
+        meta = cls._meta
+        pk_name = meta["primary_key"]
+        for f in fields:
+            if f not in meta["fields"] or f == pk_name:
+                raise ValueError(f"Invalid bulk_update field '{f}' for {cls.__name__}")
+        if any(obj._pk_value is None for obj in instances):
+            raise ValueError("Cannot bulk_update unsaved instance")
+        set_clause = ", ".join(f"{f} = %s" for f in fields)
+        sql = f"UPDATE {meta['table_name']} SET {set_clause} WHERE {pk_name} = %s"
+        params = [
+            [meta["fields"][f].to_db_value(getattr(obj, meta["fields"][f].attname)) for f in fields]
+            + [meta["fields"][pk_name].to_db_value(obj._pk_value)]
+            for obj in instances
+        ]
 
         conn, cursor = cls._get_cursor()
         try:
-            # 获取总数
-            cursor.execute(count_sql, count_params)
-            total = cursor.fetchone()[0]
-            # 获取列表
-            cursor.execute(list_sql, list_params)
-            results = cursor.fetchall()
-            fields = [desc[0] for desc in cursor.description]
-            instances = []
-            for row in results:
-                data = dict(zip(fields, row))
-                instance = cls()
-                for field_name, field in cls._meta["fields"].items():
-                    setattr(instance, field_name, field.from_db_value(data.get(field_name)))
-                instance._dirty_fields.clear()
-                instances.append(instance)
-            # 分页信息
-            total_pages = (total + page_size - 1) // page_size
-            return {
-                "list": instances,
-                "page": page,
-                "page_size": page_size,
-                "total": total,
-                "total_pages": total_pages
-            }
+            execute_batch(cursor, sql, params, page_size=batch_size)
+            for obj in instances:
+                obj._snapshot(fields)
+            logger.debug(f"[ORM] Bulk update {len(instances)} {cls.__name__} fields {list(fields)} success")
+            return len(instances)
         finally:
-            cls._release_cursor(conn, cursor)
+            cls._release_cursor(conn, cursor, commit=True)
 
     def save(self):
         """保存实例：新增或更新（根据主键是否存在）"""
@@ -252,7 +389,7 @@ class Model(metaclass=ModelMeta):
         field_names = ", ".join(fields)
         placeholders = ", ".join(["%s"] * len(fields))
         sql = f"INSERT INTO {self._meta['table_name']} ({field_names}) VALUES ({placeholders}) RETURNING {self._meta['primary_key']}"
-        params = [self._meta["fields"][f].to_db_value(getattr(self, f)) for f in fields]
+        params = [self._meta["fields"][f].to_db_value(getattr(self, self._meta["fields"][f].attname)) for f in fields]
 
         conn, cursor = self._get_cursor()
         try:
@@ -260,7 +397,7 @@ class Model(metaclass=ModelMeta):
             # 获取自增主键值
             pk_value = cursor.fetchone()[0]
             setattr(self, self._meta["primary_key"], self._meta["fields"][self._meta["primary_key"]].from_db_value(pk_value))
-            self._dirty_fields.clear()
+            self._snapshot()
             logger.debug(f"[ORM] Insert {self.__class__.__name__} {self._pk_value} success")
             return self
         finally:
@@ -268,13 +405,14 @@ class Model(metaclass=ModelMeta):
 
     def _update(self):
         """更新记录（仅更新脏字段）"""
-        if not self._dirty_fields:
+        dirty_fields = self._dirty_fields
+        if not dirty_fields:
             logger.debug(f"[ORM] No dirty fields to update for {self.__class__.__name__} {self._pk_value}")
             return self
         
-        set_clause = ", ".join([f"{f} = %s" for f in self._dirty_fields])
+        set_clause = ", ".join([f"{f} = %s" for f in dirty_fields])
         sql = f"UPDATE {self._meta['table_name']} SET {set_clause} WHERE {self._meta['primary_key']} = %s"
-        params = [self._meta["fields"][f].to_db_value(getattr(self, f)) for f in self._dirty_fields]
+        params = [self._meta["fields"][f].to_db_value(getattr(self, self._meta["fields"][f].attname)) for f in dirty_fields]
         params.append(self._meta["fields"][self._meta["primary_key"]].to_db_value(self._pk_value))
 
         conn, cursor = self._get_cursor()
@@ -282,7 +420,7 @@ class Model(metaclass=ModelMeta):
             cursor.execute(sql, params)
             if cursor.rowcount == 0:
                 raise ValueError(f"{self.__class__.__name__} {self._pk_value} not found")
-            self._dirty_fields.clear()
+            self._snapshot()
             logger.debug(f"[ORM] Update {self.__class__.__name__} {self._pk_value} success, affected rows: {cursor.rowcount}")
             return self
         finally:
@@ -311,7 +449,7 @@ class Model(metaclass=ModelMeta):
         data = {}
         desensitize = desensitize_fields or []
         for field_name, field in self._meta["fields"].items():
-            value = getattr(self, field_name)
+            value = getattr(self, field.attname)  # 外键输出原始主键值，不触发关联查询
             # 敏感数据脱敏
             if field_name in desensitize:
                 if field_name == "phone" and value and len(value) == 11:
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ORM查询结果缓存（进程内，按模型开启）
+- 模型声明 __cache_ttl__ = 秒数 后，其读查询结果按 (SQL, 参数) 缓存
+- 容量：LRU淘汰，同时受条目数(ORM_CACHE_MAX_ENTRIES)与估算字节数(ORM_CACHE_MAX_BYTES)限制
+- 失效：每张表一个版本号，save/delete/批量写/Query.update()/delete() 提交后递增；
+  条目记录写入时涉及表的版本号，读取时版本不一致即视为失效（atomic()内的写在提交后才递增）
+- atomic()事务内的读不走缓存（可能读到本事务未提交的数据）
+- 多进程部署时各进程缓存独立，其他进程的写入最多在TTL后可见
+"""
+import sys
+import time
+import threading
+from collections import OrderedDict
+from core.orm.context import current_scope
+from config.settings import ORM_CACHE_ENABLED, ORM_CACHE_MAX_ENTRIES, ORM_CACHE_MAX_BYTES
+
+
+def _freeze(value):
+    """参数转为可哈希形式（in查询的列表参数转元组）"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _estimate_size(result):
+    """估算查询结果 (列名, 行列表) 的内存占用"""
+    columns, rows = result
+    size = sys.getsizeof(columns) + sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class QueryCache:
+    """线程安全的LRU查询缓存"""
+    def __init__(self, max_entries=ORM_CACHE_MAX_ENTRIES, max_bytes=ORM_CACHE_MAX_BYTES, enabled=ORM_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {key: (结果, 字节数, 过期时间, 表版本元组)}，右端为最近使用
+        self._versions = {}            # {表名: 版本号}
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(sql, params):
+        return sql, _freeze(params)
+
+    def _table_versions(self, tables):
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def get(self, key, tables):
+        """读取缓存：未命中、过期或表版本已变化返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            result, _, expires_at, versions = entry
+            if expires_at < time.time() or versions != self._table_versions(tables):
+                self._remove(key)
+                self._stats["stale"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return result
+
+    def versions(self, tables):
+        """当前表版本（查询前获取，写入缓存时使用，避免缓存查询期间已被修改的数据）"""
+        with self._lock:
+            return self._table_versions(tables)
+
+    def set(self, key, result, ttl, versions):
+        """写入缓存并按条目数/字节数淘汰最久未使用的条目"""
+        size = _estimate_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (result, size, time.time() + ttl, versions)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def invalidate(self, table):
+        """表数据已变化：递增版本号，相关条目在下次读取时失效"""
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self):
+        """缓存统计快照"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"entries": len(self._entries), "bytes": self._bytes,
+                          "max_entries": self.max_entries, "max_bytes": self.max_bytes})
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+# 进程内全局缓存
+query_cache = QueryCache()
+
+def get_cache_stats():
+    """获取ORM缓存统计"""
+    return query_cache.get_stats()
+
+def table_changed(table):
+    """表数据已写入：atomic()内记录到作用域，提交后统一失效；否则立即失效"""
+    scope = current_scope()
+    if scope is not None and scope.atomic_depth > 0:
+        scope.changed_tables.add(table)
+    else:
+        query_cache.invalidate(table)
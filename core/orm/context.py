@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求级数据库连接：一次请求内首次ORM调用时从连接池借出一个连接，
+后续所有查询复用该连接，请求结束时统一归还
+"""
+import contextlib
+import contextvars
+from psycopg2 import extensions
+from core.orm.pool import get_db_pool
+from config.settings import POOL_INSTANCE_NAME
+
+
+class ConnectionScope:
+    """连接作用域：惰性借出一个连接，作用域结束时归还"""
+    def __init__(self, pool_name=POOL_INSTANCE_NAME):
+        self.pool_name = pool_name
+        self.conn = None
+        self.broken = False  # 连接异常（回滚失败等），归还时直接丢弃
+        self.atomic_depth = 0  # atomic()嵌套层数，>0时写操作不单独提交
+        self.changed_tables = set()  # atomic()内写过的表，事务结束后统一使查询缓存失效
+        self.commit_callbacks = []  # on_commit()注册的回调，最外层事务提交后执行
+
+    def connection(self):
+        """获取作用域连接（首次调用时借出）"""
+        if self.conn is None:
+            self.conn = get_db_pool(self.pool_name).get_connection()
+        return self.conn
+
+    def owns(self, conn):
+        """连接是否属于本作用域"""
+        return conn is not None and conn is self.conn
+
+    def reset_if_failed(self, conn):
+        """事务处于错误状态时回滚，保证后续查询可继续使用该连接"""
+        try:
+            if conn.info.transaction_status == extensions.TRANSACTION_STATUS_INERROR:
+                conn.rollback()
+        except Exception:
+            self.broken = True
+
+    def close(self):
+        """归还连接（未提交的只读事务由连接池回滚）"""
+        if self.conn is not None:
+            conn, self.conn = self.conn, None
+            get_db_pool(self.pool_name).release(conn, discard=self.broken)
+
+
+# 当前上下文的连接作用域（线程/协程隔离）
+_current_scope = contextvars.ContextVar("orm_connection_scope", default=None)
+
+def current_scope():
+    """获取当前连接作用域，不在作用域内返回None"""
+    return _current_scope.get()
+
+def begin_scope(scope):
+    """进入连接作用域，返回用于结束作用域的token"""
+    return _current_scope.set(scope)
+
+def end_scope(token):
+    """结束连接作用域并归还连接"""
+    scope = _current_scope.get()
+    _current_scope.reset(token)
+    if scope is not None:
+        scope.close()
+
+@contextlib.contextmanager
+def borrowed_scope(conn):
+    """在调用方已借出的连接上临时开启作用域：作用域内ORM调用复用conn，结束时不归还（由借出方归还）"""
+    scope = ConnectionScope()
+    scope.conn = conn
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+def begin_request_scope():
+    """开始请求级连接作用域，返回用于结束作用域的token"""
+    return begin_scope(ConnectionScope())
+
+def end_request_scope(token):
+    """结束请求级连接作用域并归还连接"""
+    end_scope(token)
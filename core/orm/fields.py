@@ -36,6 +36,8 @@ class StrField(Field):
 
 class BoolField(Field):
     """布尔字段"""
+    convert_on_read = True
+
     def _to_db(self, value):
         return bool(value)
 
@@ -44,6 +46,8 @@ class BoolField(Field):
 
 class FloatField(Field):
     """浮点数字段"""
+    convert_on_read = True
+
     def _to_db(self, value):
         return float(value)
 
@@ -78,13 +82,50 @@ class DateTimeField(Field):
         return value if isinstance(value, datetime.datetime) else None
 
 class ForeignKeyField(Field):
-    """外键字段"""
+    """
+    外键字段（数据描述符）
+    - 原始主键值存放在 <字段名>_id 槽位（如 user.role_id_id），读取不触发查询
+    - 访问 <字段名> 时才按主键加载关联实例并缓存；select_related/prefetch_related 可预先填充缓存
+    - 赋值支持模型实例或主键值
+    """
+    is_relation = True
+
     def __init__(self, to, on_delete="CASCADE", *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.to = to  # 关联模型
         self.on_delete = on_delete  # 删除策略
         self.nullable = kwargs.get("nullable", False)
 
+    def get_attname(self):
+        return f"{self.name}_id"
+
+    @property
+    def cache_name(self):
+        """关联实例缓存属性名"""
+        return f"_{self.name}_cache"
+
+    def set_cached(self, instance, related):
+        """写入关联实例缓存（select_related/prefetch_related使用）"""
+        setattr(instance, self.cache_name, related)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        raw = getattr(instance, self.attname)
+        if raw is None:
+            return None
+        related = getattr(instance, self.cache_name)
+        if related is None or related._pk_value != raw:
+            related = self.to.get(**{self.to._meta["primary_key"]: raw})
+            self.set_cached(instance, related)
+        return related
+
+    def __set__(self, instance, value):
+        if isinstance(value, self.to):
+            self.set_cached(instance, value)
+            value = value._pk_value
+        setattr(instance, self.attname, value)
+
     def _to_db(self, value):
         # 支持传入模型实例或主键值
         if isinstance(value, self.to):
@@ -92,7 +133,5 @@ class ForeignKeyField(Field):
         return int(value)
 
     def _from_db(self, value):
-        # 返回关联模型实例（延迟加载，实际使用时再查询）
-        if value is None:
-            return None
-        return self.to.get(**{self.to._meta["primary_key"]: value})
\ No newline at end of file
+        # 保留原始主键值，关联实例由描述符按需加载
+        return value
@@ -1,99 +1,309 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-PostgreSQL连接池（新增空闲超时回收，基于psycopg2）
+PostgreSQL连接池（线程安全，基于psycopg2）
+- 借出：优先复用空闲连接；未达上限则新建；已达上限则排队等待，超过POOL_TIMEOUT抛出DatabaseError
+- 借出检查：已断开或存活超过POOL_RECYCLE的连接丢弃重建；POOL_PRE_PING开启时对空闲较久的连接先执行SELECT 1
+- 归还：回滚未结束的事务后放回空闲队列
+- 回收：守护线程关闭空闲超过POOL_IDLE_TIMEOUT的连接（至少保留POOL_MIN_CONN个）
+- 统计：get_stats() 返回借出数、排队数、等待耗时等
 """
+import os
 import time
+import threading
+from collections import deque
 import psycopg2
-from psycopg2 import pool
-from config.settings import  POOL_MIN_CONN, POOL_MAX_CONN, POOL_IDLE_TIMEOUT
+from psycopg2 import extensions
+from config.settings import (
+    DATABASE_URL, PG_CHARSET, POOL_MIN_CONN, POOL_MAX_CONN, POOL_IDLE_TIMEOUT,
+    POOL_RECYCLE, POOL_TIMEOUT, POOL_PRE_PING, POOL_INSTANCE_NAME
+)
+from utils.logger import logger
 
-
-# 全局连接池实例
-db_pool = None
-# 记录每个连接的最后使用时间（key: 连接对象, value: 最后使用时间戳）
-conn_last_used = {}
 # 空闲连接检查间隔（设为超时时间的1/5，避免频繁检查）
 CHECK_INTERVAL = max(1, POOL_IDLE_TIMEOUT // 5)
+# 空闲超过该秒数的连接，借出前才做pre-ping（刚用过的连接无需检查）
+PRE_PING_IDLE_SECONDS = 5
 
-def get_db_pool():
-    """初始化数据库连接池"""
-    global db_pool
-    if db_pool is None:
-        try:
-            db_pool = pool.SimpleConnectionPool(
-                minconn=POOL_MIN_CONN,
-                maxconn=POOL_MAX_CONN,
-                dsn=DATABASE_URL
-            )
-            if db_pool:
-                print(f"数据库连接池初始化成功（最小{POOL_MIN_CONN}，最大{POOL_MAX_CONN}，空闲超时{POOL_IDLE_TIMEOUT}秒）")
-                # 启动空闲连接回收守护线程
-                start_idle_conn_reaper()
-        except Exception as e:
-            raise DatabaseError(f"数据库连接池初始化失败：{str(e)}")
 
-def get_db_connection():
-    """从连接池获取连接，更新最后使用时间"""
-    if db_pool is None:
-        init_db_pool()
-    try:
-        conn = db_pool.getconn()
-        conn.autocommit = True  # 自动提交事务
-        # 记录/更新连接最后使用时间
-        conn_last_used[conn] = time.time()
+class DatabaseError(Exception):
+    """数据库连接池异常"""
+
+
+class ConnectionPool:
+    """线程安全的PostgreSQL连接池"""
+    def __init__(self, name=POOL_INSTANCE_NAME, dsn=DATABASE_URL, minconn=POOL_MIN_CONN, maxconn=POOL_MAX_CONN,
+                 timeout=POOL_TIMEOUT, recycle=POOL_RECYCLE, idle_timeout=POOL_IDLE_TIMEOUT, pre_ping=POOL_PRE_PING):
+        self.name = name
+        self.dsn = dsn
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+        self._cond = threading.Condition()
+        self._idle = deque()      # 空闲连接 [(conn, 归还时间)]，右端为最近归还
+        self._created_at = {}     # {conn: 创建时间}
+        self._size = 0            # 已打开（含创建中）的连接数
+        self._checked_out = 0     # 已借出连接数
+        self._waiters = 0         # 正在排队等待的线程数
+        self._reaper = None
+        self._closed = False
+        # 累计统计
+        self._stats = {
+            "checkouts": 0, "timeouts": 0, "created": 0, "discarded": 0,
+            "total_wait_seconds": 0.0, "max_wait_seconds": 0.0
+        }
+
+    # ---------- 连接创建/丢弃 ----------
+    def _connect(self):
+        """新建物理连接（事务由ORM显式提交）"""
+        conn = psycopg2.connect(self.dsn, client_encoding=PG_CHARSET)
+        conn.autocommit = False
+        with self._cond:
+            self._created_at[conn] = time.time()
+            self._stats["created"] += 1
         return conn
-    except Exception as e:
-        raise DatabaseError(f"获取数据库连接失败：{str(e)}")
 
-def release_db_connection(conn):
-    """释放连接回连接池，更新最后使用时间"""
-    if db_pool and conn:
+    def _close_conn(self, conn):
+        """关闭物理连接（调用方已扣减_size）"""
+        with self._cond:
+            self._created_at.pop(conn, None)
+            self._stats["discarded"] += 1
         try:
-            db_pool.putconn(conn)
-            # 释放时也更新使用时间（避免刚释放就被回收）
-            conn_last_used[conn] = time.time()
+            conn.close()
         except Exception as e:
-            print(f"释放数据库连接失败：{str(e)}")
-
-def close_idle_connections():
-    """回收超时的空闲连接"""
-    if not db_pool or not conn_last_used:
-        return
-    current_time = time.time()
-    idle_conns = []
-    # 筛选超时的空闲连接
-    for conn, last_used in conn_last_used.items():
-        if current_time - last_used > POOL_IDLE_TIMEOUT:
-            idle_conns.append(conn)
-    # 回收超时连接
-    for conn in idle_conns:
+            logger.warning(f"[DBPool] Close connection failed: {str(e)}")
+
+    def _is_expired(self, conn, now):
+        """连接是否超过最大存活时间"""
+        return self.recycle > 0 and now - self._created_at.get(conn, now) > self.recycle
+
+    def _ping(self, conn):
+        """健康检查：SELECT 1"""
         try:
-            db_pool.close(conn)  # 关闭超时连接
-            del conn_last_used[conn]  # 从记录中移除
-            print(f"回收1个超时空闲数据库连接（超时{POOL_IDLE_TIMEOUT}秒）")
-        except Exception as e:
-            print(f"回收空闲连接失败：{str(e)}")
-            del conn_last_used[conn]
-
-def start_idle_conn_reaper():
-    """启动守护线程，定时检查并回收空闲连接"""
-    import threading
-    def reaper_loop():
-        while True:
-            close_idle_connections()
-            time.sleep(CHECK_INTERVAL)
-    # 设为守护线程：主程序退出时自动终止，无需手动关闭
-    reaper_thread = threading.Thread(target=reaper_loop, daemon=True)
-    reaper_thread.start()
-    print(f"空闲连接回收守护线程已启动（检查间隔{CHECK_INTERVAL}秒）")
-
-def close_db_pool():
-    """关闭连接池（程序退出时调用）"""
-    if db_pool:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _checkout_ready(self, conn, last_used):
+        """借出前检查连接是否可用，不可用则重建"""
+        now = time.time()
+        if conn.closed or self._is_expired(conn, now) or (
+                self.pre_ping and now - last_used > PRE_PING_IDLE_SECONDS and not self._ping(conn)):
+            self._close_conn(conn)
+            return self._connect()
+        return conn
+
+    # ---------- 借出/归还 ----------
+    def get_connection(self, timeout=None):
+        """借出连接：无可用连接时排队等待，超时抛出DatabaseError"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.time()
+        deadline = start + timeout
+        conn, last_used = None, 0
+        with self._cond:
+            if self._closed:
+                raise DatabaseError(f"Pool {self.name} is closed")
+            self._waiters += 1
+            try:
+                while True:
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise DatabaseError(
+                            f"Pool {self.name} checkout timeout after {timeout}s "
+                            f"(max {self.maxconn}, checked out {self._checked_out})"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters -= 1
+
         try:
-            db_pool.closeall()
-            conn_last_used.clear()  # 清空连接记录
-            print("数据库连接池已关闭，所有连接释放完成")
+            conn = self._connect() if conn is None else self._checkout_ready(conn, last_used)
         except Exception as e:
-            print(f"关闭数据库连接池失败：{str(e)}")
\ No newline at end of file
+            # 连接创建失败：归还名额，唤醒其他等待者
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise DatabaseError(f"获取数据库连接失败：{str(e)}")
+
+        waited = time.time() - start
+        with self._cond:
+            self._checked_out += 1
+            self._stats["checkouts"] += 1
+            self._stats["total_wait_seconds"] += waited
+            if waited > self._stats["max_wait_seconds"]:
+                self._stats["max_wait_seconds"] = waited
+        return conn
+
+    def release(self, conn, discard=False):
+        """归还连接：回滚未结束事务后放回空闲队列；discard=True或连接异常时直接关闭"""
+        if conn is None:
+            return
+        if not discard and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        now = time.time()
+        discard = discard or conn.closed or self._closed or self._is_expired(conn, now)
+        with self._cond:
+            self._checked_out -= 1
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append((conn, now))
+            self._cond.notify()
+        if discard:
+            self._close_conn(conn)
+
+    # ---------- 预热/回收/关闭 ----------
+    def warm_up(self):
+        """预先建立POOL_MIN_CONN个连接"""
+        created = []
+        with self._cond:
+            count = max(0, self.minconn - self._size)
+            self._size += count
+        try:
+            for _ in range(count):
+                created.append(self._connect())
+        finally:
+            with self._cond:
+                self._size -= count - len(created)
+                now = time.time()
+                self._idle.extend((conn, now) for conn in created)
+                self._cond.notify_all()
+        return len(created)
+
+    def close_idle_connections(self):
+        """回收超时的空闲连接（保留minconn个）"""
+        now = time.time()
+        expired = []
+        with self._cond:
+            keep = deque()
+            for conn, last_used in self._idle:
+                if self._size - len(expired) > self.minconn and (
+                        now - last_used > self.idle_timeout or self._is_expired(conn, now)):
+                    expired.append(conn)
+                else:
+                    keep.append((conn, last_used))
+            self._idle = keep
+            self._size -= len(expired)
+        for conn in expired:
+            self._close_conn(conn)
+        if expired:
+            logger.debug(f"[DBPool] Reap {len(expired)} idle connections from {self.name}")
+        return len(expired)
+
+    def start_reaper(self):
+        """启动守护线程，定时回收空闲连接"""
+        if self._reaper is not None:
+            return
+        def reaper_loop():
+            while not self._closed:
+                time.sleep(CHECK_INTERVAL)
+                try:
+                    self.close_idle_connections()
+                except Exception as e:
+                    logger.error(f"[DBPool] Reap idle connections error: {str(e)}", exc_info=True)
+        # 设为守护线程：主程序退出时自动终止，无需手动关闭
+        self._reaper = threading.Thread(target=reaper_loop, name=f"{self.name}-reaper", daemon=True)
+        self._reaper.start()
+
+    def closeall(self):
+        """关闭连接池：关闭所有空闲连接，已借出连接归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_conn(conn)
+
+    def get_stats(self):
+        """连接池统计快照"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "name": self.name,
+                "size": self._size,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                "waiters": self._waiters,
+                "minconn": self.minconn,
+                "maxconn": self.maxconn
+            })
+        stats["avg_wait_ms"] = stats["total_wait_seconds"] / stats["checkouts"] * 1000 if stats["checkouts"] else 0.0
+        return stats
+
+
+# 连接池实例 {实例名: ConnectionPool}；fork后子进程不得复用父进程的连接，按进程号隔离
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+def get_db_pool(name=POOL_INSTANCE_NAME):
+    """获取（必要时创建）连接池实例"""
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = ConnectionPool(name=name)
+            pool.start_reaper()
+            logger.info(f"[DBPool] Pool {name} created (min {pool.minconn}, max {pool.maxconn}, "
+                        f"timeout {pool.timeout}s, recycle {pool.recycle}s, idle timeout {pool.idle_timeout}s)")
+        return pool
+
+def check_pool_size(workers, maxconn=POOL_MAX_CONN, name=POOL_INSTANCE_NAME):
+    """请求期间每个工作线程独占一个连接，连接池上限小于工作线程数时抛出ValueError"""
+    if workers and maxconn < workers:
+        raise ValueError(
+            f"Pool {name} maxconn {maxconn} is less than {workers} workers, set POOL_MAX_CONN >= SERVER_WORKERS"
+        )
+
+def init_db_pool(name=POOL_INSTANCE_NAME, workers=None):
+    """
+    服务启动时初始化连接池并预热最小连接数（数据库不可用时仅告警，后续按需连接）
+    :param workers: 并发处理请求的工作线程数，传入时校验连接池上限不小于该值
+    """
+    pool = get_db_pool(name)
+    check_pool_size(workers, pool.maxconn, name)
+    try:
+        count = pool.warm_up()
+        logger.info(f"[DBPool] Pool {name} warmed up with {count} connections")
+    except Exception as e:
+        logger.warning(f"[DBPool] Pool {name} warm up failed: {str(e)}")
+    return pool
+
+def get_db_connection(name=POOL_INSTANCE_NAME):
+    """从连接池获取连接"""
+    return get_db_pool(name).get_connection()
+
+def release_db_connection(conn, name=POOL_INSTANCE_NAME):
+    """释放连接回连接池"""
+    get_db_pool(name).release(conn)
+
+def close_db_pool(name=None):
+    """关闭连接池（程序退出时调用），name为None时关闭全部"""
+    with _pools_lock:
+        names = [name] if name else list(_pools)
+        pools = [_pools.pop(n) for n in names if n in _pools]
+    for pool in pools:
+        pool.closeall()
+        logger.info(f"[DBPool] Pool {pool.name} closed")
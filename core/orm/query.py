@@ -0,0 +1,658 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查询构造：把 filter(字段__查询类型=值) 编译为WHERE子句，推到PostgreSQL执行
+- 支持查询类型：exact/in/like/ilike/gt/gte/lt/lte/isnull/range（无后缀即exact）
+- NULL语义：exact=None -> IS NULL；in列表含None -> (col = ANY(%s) OR col IS NULL)；空列表恒为假
+- 同一"查询形状"（字段+查询类型+NULL分布）的SQL片段只编译一次，之后只重新绑定参数
+"""
+import json
+import uuid
+import base64
+from functools import lru_cache
+from core.orm.pool import get_db_pool
+from core.orm.cache import query_cache
+from core.orm.context import borrowed_scope
+from core.orm.transaction import in_atomic
+from config.settings import POOL_INSTANCE_NAME
+from utils.logger import logger
+
+# 字段与查询类型分隔符
+LOOKUP_SEP = "__"
+
+# 比较类查询类型 -> SQL运算符
+COMPARE_OPERATORS = {
+    "exact": "=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+    "like": "LIKE",
+    "ilike": "ILIKE"
+}
+LOOKUP_TYPES = set(COMPARE_OPERATORS) | {"in", "isnull", "range"}
+
+
+def parse_lookup(model, key):
+    """拆分查询键：'username__like' -> ('username', 'like')，并校验字段与查询类型"""
+    field_name, _, lookup = key.partition(LOOKUP_SEP)
+    lookup = lookup or "exact"
+    if field_name not in model._meta["fields"]:
+        raise ValueError(f"Model {model.__name__} has no field '{field_name}'")
+    if lookup not in LOOKUP_TYPES:
+        raise ValueError(f"Unsupported lookup '{lookup}' for {model.__name__}.{field_name}")
+    return field_name, lookup
+
+
+def _value_shape(lookup, value):
+    """影响SQL文本的取值特征（其余取值差异只体现在参数中）"""
+    if lookup == "exact":
+        return value is None
+    if lookup == "isnull":
+        return bool(value)
+    if lookup == "in":
+        values = list(value)
+        return (any(v is None for v in values), any(v is not None for v in values))
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _compile_shape(alias, shape):
+    """按查询形状编译WHERE片段（结果缓存）"""
+    prefix = f"{alias}." if alias else ""
+    clauses = []
+    for field_name, lookup, value_shape in shape:
+        column = f"{prefix}{field_name}"
+        if lookup == "exact" and value_shape:
+            clauses.append(f"{column} IS NULL")
+        elif lookup == "isnull":
+            clauses.append(f"{column} IS NULL" if value_shape else f"{column} IS NOT NULL")
+        elif lookup == "in":
+            has_null, has_values = value_shape
+            if has_null and has_values:
+                clauses.append(f"({column} = ANY(%s) OR {column} IS NULL)")
+            elif has_null:
+                clauses.append(f"{column} IS NULL")
+            elif has_values:
+                clauses.append(f"{column} = ANY(%s)")
+            else:
+                clauses.append("FALSE")
+        elif lookup == "range":
+            clauses.append(f"{column} BETWEEN %s AND %s")
+        else:
+            clauses.append(f"{column} {COMPARE_OPERATORS[lookup]} %s")
+    return " AND ".join(clauses) if clauses else "TRUE"
+
+
+def _bind_params(field, lookup, value):
+    """按查询类型生成绑定参数（经字段to_db_value转换）"""
+    if lookup == "exact":
+        return [] if value is None else [field.to_db_value(value)]
+    if lookup == "isnull":
+        return []
+    if lookup == "in":
+        values = [field.to_db_value(v) for v in value if v is not None]
+        return [values] if values else []
+    if lookup == "range":
+        low, high = value
+        return [field.to_db_value(low), field.to_db_value(high)]
+    if lookup in ("like", "ilike"):
+        return [str(value)]
+    return [field.to_db_value(value)]
+
+
+def compile_where(model, filters, alias=None):
+    """
+    编译查询条件
+    :param model: 模型类
+    :param filters: {字段__查询类型: 值}
+    :param alias: 表别名（联表查询时使用）
+    :return: (WHERE片段, 参数列表)
+    """
+    shape = []
+    params = []
+    fields = model._meta["fields"]
+    for key, value in filters.items():
+        field_name, lookup = parse_lookup(model, key)
+        if lookup == "in":
+            if isinstance(value, (str, bytes)):
+                raise ValueError(f"Lookup '{key}' requires a list of values")
+            value = list(value)
+        shape.append((field_name, lookup, _value_shape(lookup, value)))
+        params.extend(_bind_params(fields[field_name], lookup, value))
+    return _compile_shape(alias, tuple(shape)), params
+
+
+def resolve_relation(model, name):
+    """按名称取外键字段：支持字段名（role_id）或省略_id后缀（role）"""
+    fields = model._meta["fields"]
+    field = fields.get(name) or fields.get(f"{name}_id")
+    if field is None or not field.is_relation:
+        raise ValueError(f"Model {model.__name__} has no relation '{name}'")
+    return field
+
+
+def prefetch_related_objects(instances, lookup):
+    """批量加载实例的外键关联：每级关联一条 pk IN (...) 查询，结果写入外键缓存"""
+    if not instances:
+        return
+    name, _, rest = lookup.partition(LOOKUP_SEP)
+    field = resolve_relation(type(instances[0]), name)
+    to = field.to
+    ids = {getattr(obj, field.attname) for obj in instances} - {None}
+    related = to.where(**{f"{to._meta['primary_key']}__in": list(ids)}).all() if ids else []
+    related_map = {obj._pk_value: obj for obj in related}
+    for obj in instances:
+        field.set_cached(obj, related_map.get(getattr(obj, field.attname)))
+    if rest:
+        prefetch_related_objects(related, rest)
+
+
+def encode_cursor(values):
+    """排序键值编码为不透明游标（base64url JSON）"""
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor):
+    """解析游标，格式错误抛出ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError("Invalid pagination cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid pagination cursor")
+    return values
+
+
+def _keyset_where(order, values, alias=None):
+    """
+    编译"位于上一页最后一行之后"的条件
+    - 排序方向一致时用行比较：(a, b) > (%s, %s)，可直接利用联合索引
+    - 方向混合时展开：a > x OR (a = x AND b < y) ...
+    """
+    prefix = f"{alias}." if alias else ""
+    directions = {desc for _, desc in order}
+    if len(directions) == 1:
+        op = "<" if directions.pop() else ">"
+        columns = ", ".join(f"{prefix}{name}" for name, _ in order)
+        placeholders = ", ".join(["%s"] * len(order))
+        return f"({columns}) {op} ({placeholders})", list(values)
+    clauses, params = [], []
+    for idx, (name, desc) in enumerate(order):
+        parts = [f"{prefix}{prev} = %s" for prev, _ in order[:idx]]
+        parts.append(f"{prefix}{name} {'<' if desc else '>'} %s")
+        clauses.append("(" + " AND ".join(parts) + ")")
+        params.extend(values[:idx])
+        params.append(values[idx])
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+class Query:
+    """
+    模型查询：Model.where(**filters) 返回，链式追加条件/排序/分页后执行
+    - all()/first()/paginate() 均通过 _fetch 读取并统一转为模型实例
+    - count()/exists()/count_by() 只返回聚合结果，不构造实例
+    - values()/values_list() 只查询指定列，直接返回字典/元组；only() 只加载指定列的实例
+    - update()/delete() 编译为单条UPDATE/DELETE语句，返回影响行数
+    - select_related() 以LEFT JOIN在同一条SQL中加载外键实例；prefetch_related() 每个关联一条IN查询
+    - paginate() 为偏移分页（默认按主键排序）；paginate_keyset() 为游标分页，深翻页代价不随页码增长
+    - iterator()/values_iterator() 经服务端命名游标分批读取，逐条产出，内存占用与结果集大小无关
+    - 模型声明 __cache_ttl__ 时，_fetch 的读结果进入查询缓存（core.orm.cache），事务内或 no_cache() 时不走缓存
+    """
+    def __init__(self, model, filters=None):
+        self.model = model
+        self._filters = dict(filters or {})
+        self._order_by = ()
+        self._limit = None
+        self._offset = None
+        self._only = None
+        self._select_related = ()
+        self._prefetch_related = ()
+        self._after = None  # 游标分页：上一页最后一行的排序键值
+        self._use_cache = True
+
+    def _clone(self):
+        query = Query(self.model, self._filters)
+        query._only = self._only
+        query._select_related = self._select_related
+        query._prefetch_related = self._prefetch_related
+        query._after = self._after
+        query._order_by = self._order_by
+        query._limit = self._limit
+        query._offset = self._offset
+        query._use_cache = self._use_cache
+        return query
+
+    def __repr__(self):
+        return f"<Query {self.model.__name__} {self._filters}>"
+
+    def __iter__(self):
+        return iter(self.all())
+
+    # ---------- 链式构造 ----------
+    def where(self, **filters):
+        """追加查询条件（AND）"""
+        query = self._clone()
+        query._filters.update(filters)
+        return query
+
+    def order_by(self, *fields):
+        """排序：字段名前加'-'为倒序"""
+        columns = []
+        for name in fields:
+            desc = name.startswith("-")
+            field_name = name.lstrip("-")
+            if field_name not in self.model._meta["fields"]:
+                raise ValueError(f"Model {self.model.__name__} has no field '{field_name}'")
+            columns.append((field_name, desc))
+        query = self._clone()
+        query._order_by = tuple(columns)
+        return query
+
+    def only(self, *fields):
+        """只加载指定字段（主键总会加载），其余字段为None"""
+        names = self._field_names(fields)
+        pk = self.model._meta["primary_key"]
+        query = self._clone()
+        query._only = names if pk in names else (pk,) + names
+        return query
+
+    def select_related(self, *relations):
+        """同一条SQL中LEFT JOIN加载外键实例（relations为外键字段名，可省略_id后缀）"""
+        fields = tuple(resolve_relation(self.model, name).name for name in relations)
+        query = self._clone()
+        query._select_related = tuple(dict.fromkeys(self._select_related + fields))
+        return query
+
+    def prefetch_related(self, *lookups):
+        """查询后按关联批量加载外键实例，每个关联一条IN查询；支持 'user_id__role_id' 多级"""
+        query = self._clone()
+        query._prefetch_related = tuple(dict.fromkeys(self._prefetch_related + lookups))
+        return query
+
+    def no_cache(self):
+        """跳过查询缓存，直接读取数据库（需要最新数据时使用）"""
+        query = self._clone()
+        query._use_cache = False
+        return query
+
+    def limit(self, limit, offset=None):
+        """限制返回行数"""
+        query = self._clone()
+        query._limit = limit
+        query._offset = offset
+        return query
+
+    # ---------- SQL编译 ----------
+    def _where(self, alias=None):
+        """查询条件（含游标分页的位置条件）"""
+        where, params = compile_where(self.model, self._filters, alias)
+        if self._after is not None:
+            keyset_sql, keyset_params = _keyset_where(self._order_by, self._after, alias)
+            where = f"{where} AND {keyset_sql}"
+            params.extend(keyset_params)
+        return where, params
+
+    def _field_names(self, fields):
+        """校验字段名，未指定时返回全部字段"""
+        model_fields = self.model._meta["fields"]
+        for name in fields:
+            if name not in model_fields:
+                raise ValueError(f"Model {self.model.__name__} has no field '{name}'")
+        return tuple(fields) if fields else tuple(model_fields)
+
+    def _select_sql(self, columns=None):
+        """编译SELECT语句"""
+        if columns is None:
+            columns = ", ".join(self._only) if self._only else "*"
+        where, params = self._where()
+        sql = f"SELECT {columns} FROM {self.model._meta['table_name']} WHERE {where}"
+        return sql + self._tail_sql(params), params
+
+    def _tail_sql(self, params, alias=None):
+        """ORDER BY / LIMIT / OFFSET 子句（参数追加到params）"""
+        prefix = f"{alias}." if alias else ""
+        sql = ""
+        if self._order_by:
+            sql += " ORDER BY " + ", ".join(
+                f"{prefix}{name} DESC" if desc else f"{prefix}{name}" for name, desc in self._order_by
+            )
+        if self._limit is not None:
+            sql += " LIMIT %s"
+            params.append(self._limit)
+        if self._offset:
+            sql += " OFFSET %s"
+            params.append(self._offset)
+        return sql
+
+    def _join_sql(self):
+        """
+        编译select_related联表查询：主表别名t0，关联表依次为t1、t2...
+        :return: (SQL, 参数, 列分段[(外键字段或None, 模型, 字段名元组)])
+        """
+        model = self.model
+        names = self._only or tuple(model._meta["fields"])
+        segments = [(None, model, names)]
+        columns = [f"t0.{name}" for name in names]
+        joins = []
+        for idx, field_name in enumerate(self._select_related, 1):
+            field = model._meta["fields"][field_name]
+            to = field.to
+            to_names = tuple(to._meta["fields"])
+            segments.append((field, to, to_names))
+            columns.extend(f"t{idx}.{name}" for name in to_names)
+            joins.append(f"LEFT JOIN {to._meta['table_name']} t{idx} "
+                         f"ON t{idx}.{to._meta['primary_key']} = t0.{field_name}")
+        where, params = self._where(alias="t0")
+        sql = (f"SELECT {', '.join(columns)} FROM {model._meta['table_name']} t0 "
+               f"{' '.join(joins)} WHERE {where}")
+        return sql + self._tail_sql(params, alias="t0"), params, segments
+
+    def _hydrate_joined(self, rows, segments):
+        """联表行拆分为主实例+关联实例（关联实例写入外键缓存）"""
+        (_, model, names), related_segments = segments[0], segments[1:]
+        hydrate = model._get_hydrator(names)
+        related = [
+            (field, to._get_hydrator(to_names), to_names.index(to._meta["primary_key"]), len(to_names))
+            for field, to, to_names in related_segments
+        ]
+        instances = []
+        for row in rows:
+            instance = hydrate(row)
+            start = len(names)
+            for field, related_hydrate, pk_index, width in related:
+                part = row[start:start + width]
+                start += width
+                if part[pk_index] is not None:
+                    field.set_cached(instance, related_hydrate(part))
+            instances.append(instance)
+        return instances
+
+    def _tables(self):
+        """查询涉及的表（缓存失效判断用）"""
+        fields = self.model._meta["fields"]
+        return (self.model._meta["table_name"],) + tuple(
+            fields[name].to._meta["table_name"] for name in self._select_related
+        )
+
+    def _fetch(self, sql, params):
+        """执行查询，返回 (列名列表, 行列表)；模型开启缓存、未 no_cache() 且不在事务内时先查缓存"""
+        ttl = self.model._meta["cache_ttl"]
+        if not ttl or not self._use_cache or not query_cache.enabled or in_atomic():
+            return self._fetch_db(sql, params)
+        tables = self._tables()
+        key = query_cache.make_key(sql, params)
+        result = query_cache.get(key, tables)
+        if result is None:
+            versions = query_cache.versions(tables)
+            result = self._fetch_db(sql, params)
+            query_cache.set(key, result, ttl, versions)
+        return result
+
+    def _fetch_db(self, sql, params):
+        """查询数据库，返回 (列名列表, 行列表)"""
+        model = self.model
+        conn, cursor = model._get_cursor()
+        try:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
+            return columns, rows
+        finally:
+            model._release_cursor(conn, cursor)
+
+    def _execute(self, sql, params):
+        """执行写语句并提交，返回影响行数"""
+        model = self.model
+        conn, cursor = model._get_cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+        finally:
+            model._release_cursor(conn, cursor, commit=True)
+
+    # ---------- 执行 ----------
+    def all(self):
+        """返回全部匹配的模型实例"""
+        if self._select_related:
+            sql, params, segments = self._join_sql()
+            _, rows = self._fetch(sql, params)
+            instances = self._hydrate_joined(rows, segments)
+        else:
+            columns, rows = self._fetch(*self._select_sql())
+            hydrate = self.model._get_hydrator(columns)
+            instances = [hydrate(row) for row in rows]
+        for lookup in self._prefetch_related:
+            prefetch_related_objects(instances, lookup)
+        return instances
+
+    def first(self):
+        """返回第一条匹配的模型实例，无则None"""
+        query = self if self._limit == 1 else self.limit(1, self._offset)
+        result = query.all()
+        return result[0] if result else None
+
+    def _readers(self, names):
+        """需要读取转换的列：[(列序号, 转换函数)]；外键保留原始主键值"""
+        fields = self.model._meta["fields"]
+        return [(idx, fields[name]._from_db) for idx, name in enumerate(names) if fields[name].convert_on_read]
+
+    def _fetch_values(self, fields):
+        """投影查询：返回 (列名, 已转换的行元组列表)"""
+        names = self._field_names(fields)
+        _, rows = self._fetch(*self._select_sql(", ".join(names)))
+        return names, self._convert_rows(self._readers(names), rows)
+
+    @staticmethod
+    def _convert_rows(readers, rows):
+        """对需要转换的列做类型转换"""
+        if not readers:
+            return rows
+        converted = []
+        for row in rows:
+            row = list(row)
+            for idx, func in readers:
+                if row[idx] is not None:
+                    row[idx] = func(row[idx])
+            converted.append(tuple(row))
+        return converted
+
+    def values(self, *fields):
+        """返回字典列表 [{字段: 值}]，不构造模型实例"""
+        names, rows = self._fetch_values(fields)
+        return [dict(zip(names, row)) for row in rows]
+
+    def values_list(self, *fields, flat=False):
+        """返回元组列表；flat=True且只有一个字段时返回值列表"""
+        if flat and len(fields) != 1:
+            raise ValueError("values_list(flat=True) requires exactly one field")
+        _, rows = self._fetch_values(fields)
+        if flat:
+            return [row[0] for row in rows]
+        return list(rows)
+
+    # ---------- 流式读取 ----------
+    def _iter_chunks(self, sql, params, chunk_size):
+        """
+        服务端命名游标分批读取：独占一个连接池连接（不使用请求作用域连接），产出 (description, rows, conn)，
+        生成器耗尽或被关闭时关闭游标并归还连接。atomic()内未提交的写入对其不可见
+        """
+        pool = get_db_pool(POOL_INSTANCE_NAME)
+        conn = pool.get_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor(name=f"orm_iter_{uuid.uuid4().hex}")
+            cursor.itersize = chunk_size
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield cursor.description, rows, conn
+        finally:
+            try:
+                if cursor is not None:
+                    cursor.close()
+            except Exception as e:
+                logger.warning(f"[ORM] Close server-side cursor failed: {str(e)}")
+            pool.release(conn)
+
+    def iterator(self, chunk_size=2000):
+        """逐条产出模型实例（每批chunk_size行；prefetch_related按批执行，与游标共用同一连接）"""
+        if self._select_related:
+            sql, params, segments = self._join_sql()
+        else:
+            sql, params = self._select_sql()
+            segments = None
+        chunks = self._iter_chunks(sql, params, chunk_size)
+        try:
+            hydrate = None
+            for description, rows, conn in chunks:
+                if segments is not None:
+                    instances = self._hydrate_joined(rows, segments)
+                else:
+                    if hydrate is None:
+                        hydrate = self.model._get_hydrator([desc[0] for desc in description])
+                    instances = [hydrate(row) for row in rows]
+                if self._prefetch_related:
+                    with borrowed_scope(conn):
+                        for lookup in self._prefetch_related:
+                            prefetch_related_objects(instances, lookup)
+                yield from instances
+        finally:
+            chunks.close()
+
+    def values_iterator(self, *fields, chunk_size=2000):
+        """逐条产出 {字段: 值} 字典（只查询指定列）"""
+        names = self._field_names(fields)
+        readers = self._readers(names)
+        chunks = self._iter_chunks(*self._select_sql(", ".join(names)), chunk_size)
+        try:
+            for _, rows, _ in chunks:
+                for row in self._convert_rows(readers, rows):
+                    yield dict(zip(names, row))
+        finally:
+            chunks.close()
+
+    def count(self):
+        """匹配行数：SELECT COUNT(*)"""
+        where, params = self._where()
+        sql = f"SELECT COUNT(*) FROM {self.model._meta['table_name']} WHERE {where}"
+        _, rows = self._fetch(sql, params)
+        return rows[0][0]
+
+    def exists(self):
+        """是否存在匹配行：SELECT 1 ... LIMIT 1"""
+        where, params = self._where()
+        sql = f"SELECT 1 FROM {self.model._meta['table_name']} WHERE {where} LIMIT 1"
+        _, rows = self._fetch(sql, params)
+        return bool(rows)
+
+    def count_by(self, field_name):
+        """按字段分组计数：返回 {字段值: 行数}（外键字段为关联主键值）"""
+        if field_name not in self.model._meta["fields"]:
+            raise ValueError(f"Model {self.model.__name__} has no field '{field_name}'")
+        where, params = self._where()
+        sql = (f"SELECT {field_name}, COUNT(*) FROM {self.model._meta['table_name']} "
+               f"WHERE {where} GROUP BY {field_name}")
+        _, rows = self._fetch(sql, params)
+        return {value: count for value, count in rows}
+
+    def paginate(self, page=1, page_size=10):
+        """分页查询：返回当前页实例与分页信息"""
+        if page < 1:
+            page = 1
+        offset = (page - 1) * page_size
+
+        total = self.count()
+        # 无显式排序时按主键排序，保证翻页结果稳定
+        query = self if self._order_by else self.order_by(self.model._meta["primary_key"])
+        instances = query.limit(page_size, offset).all() if total > offset else []
+        return {
+            "list": instances,
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "total_pages": (total + page_size - 1) // page_size
+        }
+
+    def update(self, **values):
+        """批量更新匹配行：UPDATE ... SET ... WHERE ...，返回影响行数"""
+        if not values:
+            raise ValueError("update() requires at least one field")
+        fields = self.model._meta["fields"]
+        names = self._field_names(tuple(values))
+        set_clause = ", ".join(f"{name} = %s" for name in names)
+        set_params = [fields[name].to_db_value(values[name]) for name in names]
+        where, params = self._where()
+        sql = f"UPDATE {self.model._meta['table_name']} SET {set_clause} WHERE {where}"
+        count = self._execute(sql, set_params + params)
+        logger.debug(f"[ORM] Update {self.model.__name__} where {self._filters}, affected rows: {count}")
+        return count
+
+    def delete(self):
+        """批量删除匹配行：DELETE ... WHERE ...，返回影响行数"""
+        where, params = self._where()
+        sql = f"DELETE FROM {self.model._meta['table_name']} WHERE {where}"
+        count = self._execute(sql, params)
+        logger.debug(f"[ORM] Delete {self.model.__name__} where {self._filters}, affected rows: {count}")
+        return count
+
+    # ---------- 游标分页 ----------
+    def _keyset_order(self):
+        """游标分页排序键：显式排序字段 + 主键（保证唯一，作为最终排序依据）"""
+        pk = self.model._meta["primary_key"]
+        order = list(self._order_by)
+        if pk not in [name for name, _ in order]:
+            order.append((pk, order[-1][1] if order else False))
+        return tuple(order)
+
+    def estimate_count(self):
+        """表行数估算（pg_class.reltuples，不考虑过滤条件；从未ANALYZE时退回精确计数）"""
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+        _, rows = self._fetch(sql, [self.model._meta["table_name"]])
+        estimate = rows[0][0] if rows else -1
+        return estimate if estimate >= 0 else self.count()
+
+    def paginate_keyset(self, cursor=None, page_size=10, with_total=False):
+        """
+        游标分页：按排序键定位，不使用OFFSET
+        :param cursor: 上一页返回的next_cursor，None为第一页
+        :param page_size: 每页条数
+        :param with_total: False-不统计总数 "exact"-COUNT(*) "estimate"-pg_class估算值
+        :return: {"list", "page_size", "next_cursor", "has_more", "total"}
+        """
+        order = self._keyset_order()
+        query = self._clone()
+        query._order_by = order
+        query._limit = page_size + 1
+        query._offset = None
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != len(order):
+                raise ValueError("Invalid pagination cursor")
+            query._after = tuple(values)
+        instances = query.all()
+
+        has_more = len(instances) > page_size
+        instances = instances[:page_size]
+        next_cursor = None
+        if has_more:
+            last = instances[-1]
+            fields = self.model._meta["fields"]
+            next_cursor = encode_cursor([getattr(last, fields[name].attname) for name, _ in order])
+
+        total = None
+        if with_total == "exact":
+            total = self.count()
+        elif with_total == "estimate":
+            total = self.estimate_count()
+        return {
+            "list": instances,
+            "page_size": page_size,
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+            "total": total
+        }
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事务：atomic() 内的所有ORM调用共用同一连接，结束时统一提交一次
+- 用法：with atomic(): ... 或 @atomic / @atomic() 装饰函数
+- 嵌套：内层使用SAVEPOINT，内层异常只回滚到保存点，外层可继续
+- 外层正常结束COMMIT，异常结束ROLLBACK；不在请求作用域内时自行借出连接并在结束时归还
+- on_commit(func)：事务提交后执行（回滚则丢弃），用于提交后才应生效的进程内状态更新
+"""
+import functools
+from core.orm.context import ConnectionScope, current_scope, begin_scope, end_scope
+from core.orm.cache import query_cache
+from utils.logger import logger
+
+
+class Atomic:
+    """事务上下文（每次进入独立计数，可重入不可跨线程共享）"""
+    def __init__(self):
+        self._scope_token = None
+        self._savepoint = None
+        self._callbacks_mark = 0  # 进入保存点时已注册的提交回调数，回滚到保存点时丢弃其后注册的
+
+    def __call__(self, func):
+        """作为装饰器：每次调用开启新的事务上下文"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Atomic():
+                return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        scope = current_scope()
+        if scope is None:
+            # 不在请求作用域内：为本事务单独借出连接
+            self._scope_token = begin_scope(ConnectionScope())
+            scope = current_scope()
+        try:
+            conn = scope.connection()
+            if scope.atomic_depth == 0:
+                # 作用域内之前的查询若已出错，先回滚再开始新事务
+                scope.reset_if_failed(conn)
+            else:
+                self._savepoint = f"sp_{scope.atomic_depth}"
+                self._callbacks_mark = len(scope.commit_callbacks)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"SAVEPOINT {self._savepoint}")
+        except Exception:
+            # 借出连接/开启事务失败时__exit__不会执行：结束本事务开启的作用域，避免当前线程沿用半初始化的作用域
+            self._savepoint = None
+            if self._scope_token is not None:
+                scope.broken = scope.broken or bool(scope.conn is not None and scope.conn.closed)
+                end_scope(self._scope_token)
+                self._scope_token = None
+            raise
+        scope.atomic_depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        scope = current_scope()
+        conn = scope.connection()
+        scope.atomic_depth -= 1
+        try:
+            if self._savepoint:
+                # 内层：释放或回滚到保存点
+                with conn.cursor() as cursor:
+                    if exc_type is None:
+                        cursor.execute(f"RELEASE SAVEPOINT {self._savepoint}")
+                    else:
+                        cursor.execute(f"ROLLBACK TO SAVEPOINT {self._savepoint}")
+                        del scope.commit_callbacks[self._callbacks_mark:]
+            elif exc_type is None:
+                try:
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            else:
+                conn.rollback()
+                logger.debug(f"[ORM] Transaction rolled back: {exc_type.__name__}")
+        except Exception:
+            scope.broken = scope.broken or bool(conn.closed)
+            raise
+        finally:
+            callbacks = ()
+            if scope.atomic_depth == 0:
+                # 事务结束：写过的表统一递增缓存版本
+                for table in scope.changed_tables:
+                    query_cache.invalidate(table)
+                scope.changed_tables.clear()
+                callbacks, scope.commit_callbacks = scope.commit_callbacks, []
+            if self._scope_token is not None:
+                end_scope(self._scope_token)
+        if not self._savepoint and exc_type is None:
+            _run_callbacks(callbacks)
+        return False
+
+
+def _run_callbacks(callbacks):
+    """执行提交回调：单个回调异常只记录日志（事务已提交，不再影响请求结果）"""
+    for func in callbacks:
+        try:
+            func()
+        except Exception as e:
+            logger.error(f"[ORM] On-commit callback {getattr(func, '__name__', func)} failed: {str(e)}", exc_info=True)
+
+
+def on_commit(func):
+    """事务提交后执行func；不在atomic()内时立即执行，事务回滚时不执行"""
+    scope = current_scope()
+    if scope is None or scope.atomic_depth == 0:
+        func()
+    else:
+        scope.commit_callbacks.append(func)
+
+
+def atomic(func=None):
+    """事务上下文管理器/装饰器：with atomic()、@atomic、@atomic() 均可"""
+    if callable(func):
+        return Atomic()(func)
+    return Atomic()
+
+
+def in_atomic():
+    """当前是否处于atomic事务内"""
+    scope = current_scope()
+    return scope is not None and scope.atomic_depth > 0
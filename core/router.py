@@ -1,13 +1,44 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import os
 import re
-import json
-from urllib.parse import urlparse, parse_qs
+import uuid
+import importlib
 from utils.logger import logger
+from core.middleware.chain import build_chain
+
+# 路径参数转换器 {类型: (匹配正则, 转换函数)}，注册路由时编译进路由树
+# 匹配失败或转换异常视为路由不匹配（不会执行中间件和处理器）
+CONVERTERS = {
+    "int": (re.compile(r"[0-9]+"), int),
+    "uuid": (re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"), uuid.UUID),
+    "slug": (re.compile(r"[-a-zA-Z0-9_]+"), str),
+    "str": (re.compile(r"[^/]+"), str),
+    # path匹配剩余全部路径（可含/），只能作为最后一段
+    "path": (re.compile(r".+"), str),
+}
+# 同一位置存在多个参数段时的尝试顺序：越严格越优先
+_CONVERTER_PRIORITY = {"int": 0, "uuid": 1, "slug": 2, "str": 3, "path": 4}
+
+class _RouteNode:
+    """路由树节点：静态路径段按字典查找，参数段逐段下探"""
+    __slots__ = ("children", "param_children", "routes")
+
+    def __init__(self):
+        self.children = {}        # 静态子节点 {路径段: _RouteNode}
+        self.param_children = []  # 参数子节点 [(参数名, 参数类型, 匹配正则, 转换函数, _RouteNode)]
+        self.routes = {}          # 终止于本节点的路由 {HTTP方法: 路由信息}
 
 class Router:
-    """路由核心类：管理所有路由规则，匹配请求"""
+    """
+    路由核心类：管理所有路由规则，匹配请求
+    - 无参数路由（如/api/user/list）：{路径: {方法: 路由}}字典直接命中，O(1)
+    - 带参数路由（如/api/user/edit/<user_id:int>）：按路径段在路由树中下探，静态段优先于参数段
+    - 参数类型（int/uuid/slug/str/path）在注册时编译，匹配时校验并转换，处理器直接收到转换后的值
+    - 每个路由的中间件链在注册时（或use()设置全局中间件时）预先计算，存于route["chain"]
+    """
     def __init__(self):
+        # 所有路由 {方法: {路由路径: 路由信息}}（便于查看/调试）
         self.routes = {
             "GET": {},
             "POST": {},
@@ -15,96 +46,187 @@ class Router:
             "DELETE": {},
             "PATCH": {}
         }
+        # 无参数路由 {路径: {方法: 路由信息}}
+        self._static_routes = {}
+        # 带参数路由树
+        self._root = _RouteNode()
+        # 全局中间件（按执行顺序）
+        self.middlewares = []
         # 路由参数正则（匹配<name>、<name:type>）
         self.param_pattern = re.compile(r"<([a-zA-Z0-9_]+)(?::([a-zA-Z0-9_]+))?>")
 
-    def add_route(self, method, path, handler):
-        """添加路由规则"""
+    def use(self, *middlewares):
+        """设置全局中间件，并重新计算所有已注册路由的中间件链"""
+        self.middlewares = list(middlewares)
+        for routes in self.routes.values():
+            for route_info in routes.values():
+                route_info["chain"] = build_chain(self.middlewares, route_info)
+
+    def add_route(self, method, path, handler, middlewares=None, skip=None, **options):
+        """
+        添加路由规则
+        :param middlewares: 路由额外启用的中间件（追加在全局中间件之后）
+        :param skip: 路由跳过的中间件（函数或函数名）
+        :param options: 其他路由选项，供中间件适用条件判断
+        """
+        method = method.upper()
+        if method not in self.routes:
+            raise ValueError(f"Unsupported route method: {method}")
         if path in self.routes[method]:
             logger.warning(f"[Router] Route {method} {path} already exists, overwrite it")
-        # 编译路由为正则，提取参数
-        regex_path, params = self._compile_route(path)
-        self.routes[method][path] = {
-            "regex": re.compile(regex_path),
+        segments, params = self._compile_route(path)
+        route_info = {
+            "method": method,
+            "path": path,
             "params": params,
-            "handler": handler
+            "handler": handler,
+            "middlewares": tuple(middlewares or ()),
+            "skip": frozenset(skip or ()),
+            "options": options
         }
+        route_info["chain"] = build_chain(self.middlewares, route_info)
+        self.routes[method][path] = route_info
+        if params:
+            node = self._root
+            for segment in segments:
+                node = self._get_child(node, segment)
+            node.routes[method] = route_info
+        else:
+            self._static_routes.setdefault(path, {})[method] = route_info
         logger.debug(f"[Router] Add route {method} {path} -> {handler.__module__}.{handler.__name__}")
 
     def _compile_route(self, path):
-        """编译路由路径为正则表达式，返回(regex, params)"""
-        regex_parts = []
+        """拆分路由路径，返回(路径段列表, 参数列表)；参数段表示为(参数名, 参数类型)"""
+        segments = []
         params = []
-        parts = path.split("/")
-        for part in parts:
-            if not part:
-                regex_parts.append(part)
-                continue
-            match = self.param_pattern.match(part)
+        for part in path.split("/")[1:]:
+            match = self.param_pattern.fullmatch(part)
             if match:
-                # 提取参数名和类型（暂不做类型校验，仅记录）
+                # 提取参数名和类型，类型必须是已注册的转换器
                 param_name, param_type = match.groups()
-                params.append((param_name, param_type or "str"))
-                # 生成参数正则（匹配任意非/字符）
-                regex_parts.append(r"([^/]+)")
+                param_type = param_type or "str"
+                if param_type not in CONVERTERS:
+                    raise ValueError(f"Unknown converter '{param_type}' in route {path}")
+                if param_type == "path" and len(segments) != path.count("/") - 1:
+                    raise ValueError(f"Converter 'path' must be the last segment in route {path}")
+                param = (param_name, param_type)
+                params.append(param)
+                segments.append(param)
             else:
-                regex_parts.append(re.escape(part))
-        # 拼接正则，添加开始和结束标识
-        regex_path = r"^" + r"/".join(regex_parts) + r"$"
-        return regex_path, params
+                segments.append(part)
+        return segments, params
+
+    @staticmethod
+    def _get_child(node, segment):
+        """获取/创建子节点"""
+        if isinstance(segment, str):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _RouteNode()
+            return child
+        for param_name, param_type, _, _, child in node.param_children:
+            if (param_name, param_type) == segment:
+                return child
+        child = _RouteNode()
+        pattern, convert = CONVERTERS[segment[1]]
+        node.param_children.append((segment[0], segment[1], pattern, convert, child))
+        node.param_children.sort(key=lambda item: _CONVERTER_PRIORITY[item[1]])
+        return child
+
+    def _search(self, node, segments, index, values):
+        """
+        在路由树中逐段下探，产出所有匹配的终止节点（静态段优先，参数段回溯）
+        values记录沿途参数值，产出时即为该节点对应的参数
+        """
+        if index == len(segments):
+            if node.routes:
+                yield node
+            return
+        segment = segments[index]
+        child = node.children.get(segment)
+        if child is not None:
+            yield from self._search(child, segments, index + 1, values)
+        if not segment:
+            return
+        for param_name, param_type, pattern, convert, child in node.param_children:
+            if param_type == "path":
+                # 吞掉剩余全部路径段
+                if child.routes:
+                    values.append((param_name, "/".join(segments[index:])))
+                    yield child
+                    values.pop()
+                continue
+            if not pattern.fullmatch(segment):
+                continue
+            try:
+                value = convert(segment)
+            except ValueError:
+                continue
+            values.append((param_name, value))
+            yield from self._search(child, segments, index + 1, values)
+            values.pop()
 
     def match(self, method, path):
-        """匹配路由，返回(handler, params, query)"""
-        method = method.upper()
-        if method not in self.routes:
-            return None, {}, {}
-        
-        # 解析查询参数
-        parsed_url = urlparse(path)
-        path = parsed_url.path
-        query = parse_qs(parsed_url.query)
-        # 转换query为单值（默认取第一个）
-        query = {k: v[0] if len(v) > 0 else "" for k, v in query.items()}
-
-        # 匹配路由规则
-        for route_path, route_info in self.routes[method].items():
-            match = route_info["regex"].match(path)
-            if match:
-                # 解析路径参数
-                params = {}
-                for idx, (param_name, _) in enumerate(route_info["params"]):
-                    params[param_name] = match.group(idx + 1)
-                logger.debug(f"[Router] Match route {method} {route_path}, params: {params}, query: {query}")
-                return route_info["handler"], params, query
-        logger.info(f"[Router] No match route {method} {route_path}")
-        return None, {}, query
+        """匹配路由，返回(路由信息, 路径参数)，未匹配返回(None, {})；path不含查询字符串"""
+        static = self._static_routes.get(path)
+        if static is not None:
+            route = static.get(method)
+            if route is not None:
+                return route, {}
+        values = []
+        for node in self._search(self._root, path.split("/")[1:], 0, values):
+            route = node.routes.get(method)
+            if route is not None:
+                return route, dict(values)
+        return None, {}
+
+    def allowed_methods(self, path):
+        """路径可匹配的所有方法（未匹配当前方法时用于返回405）"""
+        methods = set(self._static_routes.get(path, ()))
+        for node in self._search(self._root, path.split("/")[1:], 0, []):
+            methods.update(node.routes)
+        return sorted(methods)
 
 # 全局路由实例
 router = Router()
 
-def route(path, method=["GET"]):
-    """Bottle风格路由装饰器，支持多方法"""
+# 业务模块目录
+APPS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "apps")
+
+def load_apps(apps_dir=APPS_DIR):
+    """导入apps下所有views模块，完成路由注册（服务启动前调用）"""
+    loaded = []
+    for app_name in sorted(os.listdir(apps_dir)):
+        if os.path.isfile(os.path.join(apps_dir, app_name, "views.py")):
+            module_name = f"apps.{app_name}.views"
+            importlib.import_module(module_name)
+            loaded.append(module_name)
+    logger.info(f"[Router] Loaded {len(loaded)} app modules: {loaded}")
+    return loaded
+
+def route(path, method=["GET"], **kwargs):
+    """Bottle风格路由装饰器，支持多方法；kwargs透传给add_route（middlewares/skip/路由选项）"""
     if not isinstance(method, list):
         method = [method]
     
     def decorator(handler):
         for m in method:
-            router.add_route(m, path, handler)
+            router.add_route(m, path, handler, **kwargs)
         return handler
     return decorator
 
 # RESTful快捷装饰器
-def get(path):
-    return route(path, method="GET")
+def get(path, **kwargs):
+    return route(path, method="GET", **kwargs)
 
-def post(path):
-    return route(path, method="POST")
+def post(path, **kwargs):
+    return route(path, method="POST", **kwargs)
 
-def put(path):
-    return route(path, method="PUT")
+def put(path, **kwargs):
+    return route(path, method="PUT", **kwargs)
 
-def delete(path):
-    return route(path, method="DELETE")
+def delete(path, **kwargs):
+    return route(path, method="DELETE", **kwargs)
 
-def patch(path):
-    return route(path, method="PATCH")
\ No newline at end of file
+def patch(path, **kwargs):
+    return route(path, method="PATCH", **kwargs)
\ No newline at end of file
@@ -2,99 +2,149 @@
 # -*- coding: utf-8 -*-
 import os
 import json
+import time
+import queue
+import signal
+import socket
+import selectors
+import threading
 import mimetypes
-from urllib.parse import unquote
+from collections import deque
+from email.utils import formatdate
+from urllib.parse import unquote, parse_qs
 from http.server import HTTPServer, BaseHTTPRequestHandler
 
 # 原有所有导入依赖（完全不变）
-from core.router import router
-from config.settings import STATIC_DIR, DEBUG
+from core.router import router, load_apps
+from core.orm.pool import init_db_pool, close_db_pool, check_pool_size
+from core.orm.context import begin_request_scope, end_request_scope
+from core.orm.transaction import atomic
+from config.settings import (
+    STATIC_DIR, DEBUG, SERVER_MODE, SERVER_WORKERS, SERVER_QUEUE_SIZE,
+    PREFORK_WORKERS, PREFORK_REUSEPORT, KEEPALIVE_TIMEOUT, SERVER_DRAIN_TIMEOUT, KEEPALIVE_MAX_REQUESTS,
+    REQUEST_READ_TIMEOUT, ATOMIC_WRITE_ROUTES
+)
 from utils.logger import logger
+from utils.password import password_service
 from core.middleware import (
     csrf_middleware, rate_limit_middleware, throttle_middleware,
-    debounce_middleware, auth_middleware, desensitize_middleware
+    debounce_middleware, auth_middleware, permission_middleware, desensitize_middleware
 )
 
-# 注册全局中间件（执行顺序：从上到下，完全不变）
+# 注册全局中间件（执行顺序：从上到下）；路由注册时按各中间件的适用条件预先计算出每个路由的中间件链
 GLOBAL_MIDDLEWARES = [
     rate_limit_middleware,    # 接口限流
     csrf_middleware,          # CSRF防护
     auth_middleware,          # 权限认证
+    permission_middleware,    # 接口权限校验（路由声明perm时）
     throttle_middleware,      # 请求节流
     debounce_middleware,      # 请求防抖
     desensitize_middleware    # 敏感数据脱敏
 ]
+router.use(*GLOBAL_MIDDLEWARES)
 
-# ===================== 原有Request类（完全不变） =====================
+# ===================== Request类 =====================
 class Request:
-    """HTTP请求对象：解析请求数据"""
-    def __init__(self, raw_data, client_addr):
-        self.raw_data = raw_data.decode("utf-8", errors="ignore")
+    """
+    HTTP请求对象：直接由连接层已解析的方法、路径、请求头、请求体构造，不再重新拼接/解析原始报文
+    Cookie、查询参数、请求体（JSON/表单）均在首次访问时才解析
+    """
+    def __init__(self, method, path, headers=None, body=b"", client_addr=None):
+        self.method = method.upper()
+        # 拆分路径与查询字符串
+        path, _, query_string = path.partition("?")
+        self.path = unquote(path)
+        self.query_string = query_string
+        # 请求头映射（HTTPServer/asyncio引擎传入http.client.HTTPMessage，键大小写不敏感）
+        self.headers = headers if headers is not None else {}
+        self.raw_body = body or b""
         self.client_addr = client_addr
-        self.method = "GET"
-        self.path = "/"
-        self.headers = {}
-        self.body = {}
-        self.cookies = {}
-        self.csrf_token = None
         self.user = None  # 认证后用户信息
-        self._parse()
-
-    def _parse(self):
-        """解析HTTP请求"""
-        if not self.raw_data:
-            return
-        
-        # 分割请求行、头部、体
-        parts = self.raw_data.split("\r\n\r\n", 1)
-        header_part = parts[0]
-        body_part = parts[1] if len(parts) > 1 else ""
-
-        # 解析请求行和头部
-        lines = header_part.split("\r\n")
-        if lines:
-            # 请求行：METHOD PATH PROTOCOL
-            request_line = lines[0].strip()
-            if request_line:
-                method, path, _ = request_line.split(" ", 2)
-                self.method = method
-                self.path = unquote(path)
-            # 解析头部
-            for line in lines[1:]:
-                if ":" in line:
-                    key, value = line.split(":", 1)
-                    self.headers[key.strip()] = value.strip()
-
-        # 解析Cookies
-        if "Cookie" in self.headers:
-            cookie_str = self.headers["Cookie"]
-            for cookie in cookie_str.split(";"):
-                if "=" in cookie:
-                    k, v = cookie.split("=", 1)
-                    self.cookies[k.strip()] = v.strip()
-            self.csrf_token = self.cookies.get("X-CSRF-Token")
-
-        # 解析请求体
+        self.route = None  # 匹配到的路由信息（中间件可读取路由选项，如perm）
+        self._cookies = None
+        self._query = None
+        self._body = None
+
+    @property
+    def cookies(self):
+        """Cookie字典（首次访问时解析）"""
+        if self._cookies is None:
+            cookies = {}
+            cookie_str = self.headers.get("Cookie")
+            if cookie_str:
+                for cookie in cookie_str.split(";"):
+                    if "=" in cookie:
+                        k, v = cookie.split("=", 1)
+                        cookies[k.strip()] = v.strip()
+            self._cookies = cookies
+        return self._cookies
+
+    @property
+    def csrf_token(self):
+        """Cookie中的CSRF Token"""
+        return self.cookies.get("X-CSRF-Token")
+
+    @property
+    def query(self):
+        """查询参数（单值，默认取第一个；首次访问时解析）"""
+        if self._query is None:
+            query = parse_qs(self.query_string) if self.query_string else {}
+            self._query = {k: v[0] if len(v) > 0 else "" for k, v in query.items()}
+        return self._query
+
+    @property
+    def body(self):
+        """请求体（JSON/表单，首次访问时解析，其他类型为空字典）"""
+        if self._body is None:
+            self._body = self._parse_body()
+        return self._body
+
+    @body.setter
+    def body(self, value):
+        self._body = value
+
+    def _parse_body(self):
+        """解析请求体"""
+        if not self.raw_body:
+            return {}
         content_type = self.headers.get("Content-Type", "")
-        if "application/json" in content_type and body_part:
+        if "application/json" in content_type:
             try:
-                self.body = json.loads(body_part)
-            except json.JSONDecodeError:
-                self.body = {}
-        elif "application/x-www-form-urlencoded" in content_type and body_part:
-            from urllib.parse import parse_qs
-            self.body = parse_qs(body_part)
-            self.body = {k: v[0] if len(v) > 0 else "" for k, v in self.body.items()}
-        else:
-            self.body = {}
-
-# ===================== 原有Response类（完全不变，已内置跨域头） =====================
+                return json.loads(self.raw_body)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                return {}
+        if "application/x-www-form-urlencoded" in content_type:
+            form = parse_qs(self.raw_body.decode("utf-8", errors="ignore"))
+            return {k: v[0] if len(v) > 0 else "" for k, v in form.items()}
+        return {}
+
+# 状态码描述
+STATUS_MESSAGES = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+    404: "Not Found", 405: "Method Not Allowed", 411: "Length Required",
+    429: "Too Many Requests", 431: "Request Header Fields Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable"
+}
+
+# Date响应头缓存 [秒级时间戳, 格式化字符串]，同一秒内复用
+_date_cache = [0, ""]
+
+def _http_date():
+    """当前时间的HTTP Date格式（RFC 7231）"""
+    now = int(time.time())
+    if _date_cache[0] != now:
+        _date_cache[1] = formatdate(now, usegmt=True)
+        _date_cache[0] = now
+    return _date_cache[1]
+
+# ===================== 原有Response类（已内置跨域头） =====================
 class Response:
     """HTTP响应对象：构造响应数据"""
     def __init__(self, status=200, headers=None, body=None):
         self.status = status
         self.headers = headers or {}
         self.body = body or b""
+        self.body_iter = None  # 流式响应体（可迭代bytes），以chunked编码发送
         self._set_default_headers()
 
     def _set_default_headers(self):
@@ -147,44 +197,111 @@ class Response:
             self.body = f.read()
         return self
 
-    def build(self):
-        """构建最终的HTTP响应字节流"""
-        # 状态码描述
-        status_messages = {
-            200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
-            404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"
-        }
-        status_msg = status_messages.get(self.status, "Unknown Status")
+    def stream(self, iterable, status=200):
+        """构造流式响应：iterable逐块产出bytes/str，以chunked编码发送，不整体驻留内存"""
+        self.status = status
+        self.body_iter = iterable
+        return self
+
+    def close(self):
+        """释放流式响应体（客户端断开时也需调用，使生成器内的finally得以执行）"""
+        if self.body_iter is not None and hasattr(self.body_iter, "close"):
+            self.body_iter.close()
+
+    def _build_head(self, keep_alive):
+        """构建响应行+响应头"""
+        status_msg = STATUS_MESSAGES.get(self.status, "Unknown Status")
         # 构建响应行
         response_line = f"HTTP/1.1 {self.status} {status_msg}\r\n"
+        self.headers["Date"] = _http_date()
+        if not keep_alive:
+            self.headers["Connection"] = "close"
+        elif "Connection" not in self.headers:
+            self.headers["Connection"] = "keep-alive"
+            self.headers["Keep-Alive"] = f"timeout={KEEPALIVE_TIMEOUT}, max={KEEPALIVE_MAX_REQUESTS}"
         # 构建响应头
         response_headers = "".join([f"{k}: {v}\r\n" for k, v in self.headers.items()])
-        # 构建响应体
-        response_body = self.body
+        return (response_line + response_headers + "\r\n").encode("utf-8")
+
+    def build(self, keep_alive=False):
+        """
+        构建最终的HTTP响应字节流
+        :param keep_alive: 是否保持连接（由连接层根据请求头、请求数上限等决定）
+        """
+        if self.body_iter is not None:
+            return b"".join(self.iter_bytes(keep_alive))
+        # 响应体长度（长连接下客户端依赖它划分响应边界）
+        self.headers["Content-Length"] = str(len(self.body))
         # 拼接所有部分
-        return (response_line + response_headers + "\r\n").encode("utf-8") + response_body
+        return self._build_head(keep_alive) + self.body
+
+    def iter_bytes(self, keep_alive=False, chunked=True):
+        """
+        逐块产出响应字节流：普通响应一次产出，流式响应按chunk产出
+        :param chunked: 客户端是否支持chunked（HTTP/1.0不支持，此时发送原始数据并关闭连接）
+        """
+        if self.body_iter is None:
+            yield self.build(keep_alive)
+            return
+        self.headers.pop("Content-Length", None)
+        if chunked:
+            self.headers["Transfer-Encoding"] = "chunked"
+        else:
+            keep_alive = False
+        yield self._build_head(keep_alive)
+        for chunk in self.body_iter:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if not chunk:
+                continue
+            yield b"%X\r\n%s\r\n" % (len(chunk), chunk) if chunked else chunk
+        if chunked:
+            yield b"0\r\n\r\n"
 
 # ===================== 原有请求处理逻辑（完全不变） =====================
-def handle_request(raw_data, client_addr):
-    """处理单个HTTP请求"""
+def handle_request(request):
+    """处理单个HTTP请求（Request由连接层构造），返回Response对象（由连接层决定长连接与分帧方式后发送）"""
+    # 请求级数据库连接：首次ORM调用时借出，本请求内所有查询复用，处理结束后归还
+    scope_token = begin_request_scope()
+    try:
+        return _dispatch(request)
+    finally:
+        end_request_scope(scope_token)
+
+# 默认包裹事务的写方法（ATOMIC_WRITE_ROUTES开启时）
+WRITE_METHODS = ("POST", "PUT", "DELETE", "PATCH")
+
+def _route_atomic(route):
+    """路由是否在事务中执行：路由参数atomic优先，否则按ATOMIC_WRITE_ROUTES与请求方法决定"""
+    option = route["options"].get("atomic")
+    if option is not None:
+        return option
+    return ATOMIC_WRITE_ROUTES and route["method"] in WRITE_METHODS
+
+def _dispatch(request):
+    """路由匹配 -> 中间件链 -> 处理器 -> 构造响应"""
     try:
-        # 1. 解析请求
-        request = Request(raw_data, client_addr)
         response = Response()
 
         # 处理OPTIONS预检请求（原有逻辑，已适配跨域）
         if request.method == "OPTIONS":
-            return response.build()
+            return response
 
         # 2. 匹配路由（静态文件优先）
         if request.path.startswith("/static/"):
             file_path = os.path.join(STATIC_DIR, request.path[8:])
             response.static(file_path)
-            return response.build()
+            return response
         
         # 匹配接口路由
-        handler, params, query = router.match(request.method, request.path)
-        if not handler:
+        route, params = router.match(request.method, request.path)
+        if route is None:
+            # 路径存在但方法不匹配：405
+            allowed = router.allowed_methods(request.path)
+            if allowed:
+                response.headers["Allow"] = ", ".join(allowed + ["OPTIONS"])
+                response.json({"code": 405, "msg": "Method not allowed"}, 405)
+                return response
             # 匹配前端页面
             if request.path == "/":
                 file_path = os.path.join(STATIC_DIR, "index.html")
@@ -194,21 +311,29 @@ def handle_request(raw_data, client_addr):
                 response.static(file_path)
             else:
                 response.json({"code": 404, "msg": "API not found"}, 404)
-            return response.build()
+            return response
 
-        # 3. 执行全局中间件
-        for middleware in GLOBAL_MIDDLEWARES:
+        # 3. 执行路由预编译的中间件链
+        request.route = route
+        for middleware in route["chain"]:
             middleware_result = middleware(request, response)
             if middleware_result is not None:
                 # 中间件返回非None表示中断请求
-                return middleware_result.build()
+                return middleware_result
 
-        # 4. 执行接口处理器
-        # 合并参数：path_params > query > body
-        all_params = {**request.body, **query, **params}
-        result = handler(request, **all_params)
+        # 4. 执行接口处理器：仅传入路径参数，查询参数/请求体由处理器按需从request.query/request.body读取
+        if _route_atomic(route):
+            # 事务路由：处理器内所有写操作一次提交，异常整体回滚
+            with atomic():
+                result = route["handler"](request, **params)
+        else:
+            result = route["handler"](request, **params)
 
-        # 5. 构造响应
+        # 5. 构造响应（处理器可直接返回Response，如流式下载；中间件已设置的响应头合并过去）
+        if isinstance(result, Response):
+            for key, value in response.headers.items():
+                result.headers.setdefault(key, value)
+            return result
         if isinstance(result, dict):
             response.json({"code": 200, "msg": "success", "data": result})
         elif isinstance(result, tuple) and len(result) == 2:
@@ -217,14 +342,14 @@ def handle_request(raw_data, client_addr):
         else:
             response.json({"code": 200, "msg": "success", "data": result})
 
-        return response.build()
+        return response
 
     except Exception as e:
         logger.error(f"[Server] Handle request error: {str(e)}", exc_info=True)
         response = Response()
         error_msg = str(e) if DEBUG else "Internal server error"
         response.json({"code": 500, "msg": error_msg}, 500)
-        return response.build()
+        return response
 
 # ===================== 修复后的HTTPServer请求处理器（核心修改） =====================
 class HTTPServerRequestHandler(BaseHTTPRequestHandler):
@@ -233,6 +358,69 @@ class HTTPServerRequestHandler(BaseHTTPRequestHandler):
     桥接HTTPServer和原有handle_request逻辑，无侵入式适配
     修复：删除未定义方法调用 + 移除重复do_OPTIONS + 复用原有跨域逻辑
     """
+    # 使用HTTP/1.1：支持长连接；rfile带缓冲，管线化的多个请求按序逐个处理、按序响应
+    protocol_version = "HTTP/1.1"
+    # socket读写超时（请求体/响应）；threadpool模式下空闲连接由服务端空闲监听线程计时
+    timeout = KEEPALIVE_TIMEOUT
+    # 请求行/请求头读取超时：客户端只发半截请求时尽快释放工作线程
+    request_timeout = REQUEST_READ_TIMEOUT
+
+    def setup(self):
+        """连接建立：初始化本连接已处理请求数"""
+        super().setup()
+        self.requests_served = 0
+        self.parked = False  # 空闲长连接已交还服务端等待下一个请求（连接保持打开）
+
+    def handle(self):
+        """
+        处理连接上的请求：服务端支持空闲连接等待（threadpool模式）时，每个请求处理完后
+        若缓冲区中没有下一个请求，标记parked并返回，工作线程不再阻塞等待空闲长连接；
+        不支持时（single模式）每个响应后关闭连接，空闲长连接不会阻塞其他客户端
+        """
+        can_park = getattr(self.server, "parks_idle_connections", False)
+        self.close_connection = True
+        self._read_request()
+        while not self.close_connection:
+            if can_park and not self._has_pending_input():
+                self.parked = True
+                return
+            self._read_request()
+
+    def _read_request(self):
+        """处理一个请求：请求行/请求头按request_timeout读取，解析完成后恢复timeout"""
+        self.connection.settimeout(self.request_timeout)
+        self.handle_one_request()
+
+    def parse_request(self):
+        """请求头读取完成：请求体/响应按timeout读写"""
+        ok = super().parse_request()
+        self.connection.settimeout(self.timeout)
+        return ok
+
+    def _has_pending_input(self):
+        """rfile缓冲区或socket中是否已有下一个请求的数据（非阻塞探测，不消耗数据）"""
+        try:
+            self.connection.setblocking(False)
+            return bool(self.rfile.peek(1))
+        except OSError:
+            # 连接异常：交给handle_one_request读取时处理（读到空行即关闭）
+            return True
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def resume(self):
+        """空闲长连接收到新数据后由工作线程调用，继续处理请求"""
+        self.parked = False
+        try:
+            self.handle()
+        finally:
+            self.finish()
+
+    def finish(self):
+        """连接结束：已park的连接保持rfile/wfile打开"""
+        if not self.parked:
+            super().finish()
+
     def do_GET(self):
         """处理GET请求：复用原有handle_request"""
         self._handle_all_methods()
@@ -258,41 +446,321 @@ class HTTPServerRequestHandler(BaseHTTPRequestHandler):
         self._handle_all_methods()
 
     def _handle_all_methods(self):
-        """统一处理所有HTTP方法，桥接原有逻辑（完全不变）"""
-        # 1. 构造原始请求数据（模拟原生socket的raw_data格式）
-        # 拼接请求行
-        request_line = f"{self.command} {self.path} HTTP/1.1\r\n"
-        # 拼接请求头
-        request_headers = "".join([f"{k}: {v}\r\n" for k, v in self.headers.items()])
-        # 读取请求体
-        content_length = int(self.headers.get("Content-Length", 0))
+        """统一处理所有HTTP方法：直接用已解析的请求行/请求头构造Request，交给handle_request"""
+        # 1. 读取请求体（不支持chunked请求体，无法确定边界时关闭连接）
+        if self.headers.get("Transfer-Encoding"):
+            self.close_connection = True
+            self.wfile.write(Response().json({"code": 411, "msg": "Content-Length required"}, 411).build())
+            return
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+            if content_length < 0:
+                raise ValueError(content_length)
+        except ValueError:
+            self.close_connection = True
+            self.wfile.write(Response().json({"code": 400, "msg": "Invalid Content-Length"}, 400).build())
+            return
         request_body = self.rfile.read(content_length) if content_length > 0 else b""
-        # 拼接完整raw_data（与原有socket的raw_data格式完全一致）
-        raw_data = (request_line + request_headers + "\r\n").encode("utf-8") + request_body
-
-        # 2. 调用原有请求处理逻辑，获取响应（原有跨域/OPTIONS逻辑已处理）
-        client_addr = self.client_address  # 客户端地址（ip, port）
-        response = handle_request(raw_data, client_addr)
 
-        # 3. 发送响应到客户端（HTTPServer原生方法）
-        self.wfile.write(response)
+        # 2. 调用请求处理逻辑，获取响应（客户端地址：ip, port）
+        request = Request(self.command, self.path, self.headers, request_body, self.client_address)
+        response = handle_request(request)
+
+        # 3. 长连接判断：客户端要求关闭（HTTP/1.0默认关闭）或达到单连接请求数上限时关闭
+        self.requests_served += 1
+        chunked = self.request_version == "HTTP/1.1"
+        if (self.requests_served >= KEEPALIVE_MAX_REQUESTS or getattr(self.server, "closing", False)
+                or not getattr(self.server, "parks_idle_connections", False)
+                or (response.body_iter is not None and not chunked)):
+            self.close_connection = True
+
+        # 4. 发送响应到客户端（HTTPServer原生方法），流式响应逐块写出
+        try:
+            for chunk in response.iter_bytes(not self.close_connection, chunked):
+                self.wfile.write(chunk)
+        finally:
+            response.close()
 
     def log_message(self, format, *args):
         """重写日志方法：禁用HTTPServer默认控制台日志，统一使用项目logger"""
         pass
 
-# ===================== 启动HTTPServer服务（完全不变） =====================
+# 请求头最大长度：超过时不再等待，直接交给处理器（由http.server返回414/431）
+MAX_REQUEST_HEAD = 65536
+
+# ===================== 线程池HTTPServer =====================
+class ThreadPoolHTTPServer(HTTPServer):
+    """
+    线程池HTTPServer：监听线程只负责accept，连接投递到有界队列，由固定数量的工作线程处理
+    工作线程内仍走HTTPServerRequestHandler -> handle_request，处理逻辑不变
+    背压：队列已满时直接返回503并关闭连接，不再无限堆积
+    长连接：新接受的连接和请求处理完后空闲的连接都交给空闲监听线程（selector）等待，可读时才入队，
+    空闲超过KEEPALIVE_TIMEOUT关闭；工作线程只在有请求可处理时占用，预连接/空闲长连接再多也不会占满线程池
+    """
+    # HTTPServerRequestHandler据此在请求间隙park连接
+    parks_idle_connections = True
+    # 空闲连接超时检查间隔（秒）
+    IDLE_SWEEP_INTERVAL = 1
+    # 请求头未收全的连接重新检查间隔（秒）
+    PARTIAL_POLL_INTERVAL = 0.05
+
+    def __init__(self, server_address, RequestHandlerClass, workers=SERVER_WORKERS,
+                 queue_size=SERVER_QUEUE_SIZE, bind_and_activate=True, keepalive_timeout=KEEPALIVE_TIMEOUT):
+        super().__init__(server_address, RequestHandlerClass, bind_and_activate)
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.keepalive_timeout = keepalive_timeout
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._stats_lock = threading.Lock()
+        self._threads = []
+        # 每个工作线程的统计 {线程名: {handled, errors, busy, busy_seconds, queue_wait_seconds}}
+        self.worker_stats = {}
+        self.rejected_count = 0
+        # 等待可读的连接 (request, client_address, handler)：放入_idle_pending并唤醒空闲监听线程，由其登记到selector
+        # handler为None表示新接受、尚未读取请求的连接
+        self._idle_selector = selectors.DefaultSelector()
+        self._idle_pending = deque()
+        self._idle_lock = threading.Lock()
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self._wakeup_send.setblocking(False)
+        self._idle_selector.register(self._wakeup_recv, selectors.EVENT_READ, None)
+        self.closing = False  # 服务关闭中：处理中的长连接在当前响应后关闭，不再park
+        self._idle_thread = threading.Thread(target=self._idle_loop, name="http-idle", daemon=True)
+        self._idle_thread.start()
+        self._start_workers()
+
+    def _start_workers(self):
+        """启动固定数量的工作线程"""
+        for i in range(self.workers):
+            name = f"http-worker-{i}"
+            self.worker_stats[name] = {
+                "handled": 0, "errors": 0, "busy": False,
+                "busy_seconds": 0.0, "queue_wait_seconds": 0.0
+            }
+            t = threading.Thread(target=self._worker_loop, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def process_request(self, request, client_address):
+        """重写：新连接交给空闲监听线程，可读后入队由工作线程处理"""
+        self._watch(request, client_address, None)
+
+    def _reject_request(self, request, client_address):
+        """队列已满：返回503 + Retry-After，立即关闭连接"""
+        with self._stats_lock:
+            self.rejected_count += 1
+        logger.warning(f"[Server] Queue full ({self.queue_size}), reject connection from {client_address}")
+        response = Response(headers={"Retry-After": "1"})
+        response.json({"code": 503, "msg": "Server busy, please retry later"}, 503)
+        try:
+            request.sendall(response.build())
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _worker_loop(self):
+        """工作线程：循环取连接处理，收到None退出"""
+        stats = self.worker_stats[threading.current_thread().name]
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            request, client_address, enqueue_time, handler = item
+            start = time.time()
+            stats["busy"] = True
+            stats["queue_wait_seconds"] += start - enqueue_time
+            try:
+                if handler is None:
+                    handler = self.RequestHandlerClass(request, client_address, self)
+                else:
+                    handler.resume()
+            except Exception:
+                stats["errors"] += 1
+                self.handle_error(request, client_address)
+            finally:
+                if handler is not None and handler.parked:
+                    self._park(handler)
+                else:
+                    self.shutdown_request(request)
+                stats["handled"] += 1
+                stats["busy_seconds"] += time.time() - start
+                stats["busy"] = False
+
+    # ---------- 空闲长连接 ----------
+    def _wakeup_idle_loop(self):
+        try:
+            self._wakeup_send.send(b"\0")
+        except OSError:
+            pass
+
+    def _park(self, handler):
+        """连接处理完一个请求后空闲：交给空闲监听线程等待下一个请求"""
+        self._watch(handler.request, handler.client_address, handler)
+
+    def _watch(self, request, client_address, handler):
+        """交给空闲监听线程等待连接可读；服务关闭中直接关闭连接"""
+        with self._idle_lock:
+            closing = self.closing
+            if not closing:
+                self._idle_pending.append((request, client_address, handler))
+        if closing:
+            self._close_idle(request, handler)
+        else:
+            self._wakeup_idle_loop()
+
+    @staticmethod
+    def _release_handler(handler):
+        """已park的处理器：关闭rfile/wfile"""
+        if handler is None:
+            return
+        handler.parked = False
+        try:
+            handler.finish()
+        except OSError:
+            pass
+
+    def _close_idle(self, request, handler):
+        """关闭等待中的连接"""
+        self._release_handler(handler)
+        self.shutdown_request(request)
+
+    def _dispatch_idle(self, request, client_address, handler):
+        """连接可读：入队由工作线程处理，队满返回503并关闭"""
+        try:
+            self._queue.put_nowait((request, client_address, time.time(), handler))
+        except queue.Full:
+            self._release_handler(handler)
+            self._reject_request(request, client_address)
+
+    @staticmethod
+    def _request_head_ready(request):
+        """请求头是否已完整到达（MSG_PEEK，不消耗数据）；连接关闭/出错/请求头超长时也返回True，交给处理器读取时处理"""
+        try:
+            data = request.recv(MAX_REQUEST_HEAD, socket.MSG_PEEK | getattr(socket, "MSG_DONTWAIT", 0))
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+        return not data or b"\n\r\n" in data or b"\n\n" in data or len(data) >= MAX_REQUEST_HEAD
+
+    def _idle_loop(self):
+        """
+        空闲监听线程：连接可读且请求头已完整到达后入队，工作线程不会阻塞在读取半截请求上；
+        空闲超过keepalive_timeout、请求头超过REQUEST_READ_TIMEOUT未收全或服务关闭时关闭连接
+        """
+        next_sweep = time.time() + self.IDLE_SWEEP_INTERVAL
+        partial = {}  # 已可读但请求头未收全的连接 {request: (request, client_address, handler, 截止时间)}
+        while True:
+            timeout = self.PARTIAL_POLL_INTERVAL if partial else self.IDLE_SWEEP_INTERVAL
+            for key, _ in self._idle_selector.select(timeout=timeout):
+                if key.data is None:
+                    try:
+                        while self._wakeup_recv.recv(4096):
+                            pass
+                    except OSError:
+                        pass
+                    continue
+                self._idle_selector.unregister(key.fileobj)
+                request, client_address, handler, _ = key.data
+                partial[request] = (request, client_address, handler, time.time() + REQUEST_READ_TIMEOUT)
+            with self._idle_lock:
+                closing = self.closing
+                pending, self._idle_pending = self._idle_pending, deque()
+            now = time.time()
+            for request, (_, client_address, handler, deadline) in list(partial.items()):
+                if self._request_head_ready(request):
+                    del partial[request]
+                    self._dispatch_idle(request, client_address, handler)
+                elif closing or deadline <= now:
+                    del partial[request]
+                    self._close_idle(request, handler)
+            for request, client_address, handler in pending:
+                self._idle_selector.register(request, selectors.EVENT_READ,
+                                             (request, client_address, handler, now + self.keepalive_timeout))
+            if closing or now >= next_sweep:
+                next_sweep = now + self.IDLE_SWEEP_INTERVAL
+                for key in list(self._idle_selector.get_map().values()):
+                    if key.data is not None and (closing or key.data[3] <= now):
+                        self._idle_selector.unregister(key.fileobj)
+                        self._close_idle(key.data[0], key.data[2])
+            if closing:
+                break
+
+    def get_stats(self):
+        """获取线程池运行统计（快照）"""
+        workers = {name: dict(s) for name, s in self.worker_stats.items()}
+        return {
+            "workers": self.workers,
+            "busy_workers": sum(1 for s in workers.values() if s["busy"]),
+            "queue_size": self.queue_size,
+            "queue_depth": self._queue.qsize(),
+            "idle_connections": len(self._idle_selector.get_map()) - 1 if not self.closing else 0,
+            "rejected": self.rejected_count,
+            "handled": sum(s["handled"] for s in workers.values()),
+            "worker_stats": workers
+        }
+
+    def server_close(self):
+        """
+        关闭服务（优雅）：停止接受新连接；已入队的连接仍由工作线程处理并响应，
+        处理中的长连接在当前响应后关闭（Connection: close），空闲长连接直接关闭；
+        工作线程最多等待SERVER_DRAIN_TIMEOUT秒
+        """
+        with self._idle_lock:
+            self.closing = True
+        super().server_close()
+        self._wakeup_idle_loop()
+        self._idle_thread.join(timeout=5)
+        # 退出信号排在已入队连接之后，工作线程处理完队列中的连接再退出
+        deadline = time.time() + SERVER_DRAIN_TIMEOUT
+        for _ in self._threads:
+            try:
+                self._queue.put(None, timeout=max(0.1, deadline - time.time()))
+            except queue.Full:
+                break
+        for t in self._threads:
+            t.join(timeout=max(0, deadline - time.time()))
+        alive = sum(1 for t in self._threads if t.is_alive())
+        if alive:
+            logger.warning(f"[Server] {alive} workers still busy after {SERVER_DRAIN_TIMEOUT}s drain timeout")
+        logger.info(f"[Server] Thread pool stopped, stats: handled={self.get_stats()['handled']}, rejected={self.rejected_count}")
+
+# ===================== 启动HTTPServer服务 =====================
+def create_http_server(host, port, mode=SERVER_MODE, sock=None):
+    """
+    按运行模式创建HTTPServer实例（single/threadpool）
+    :param sock: 已绑定并监听的socket（prefork模式下由主进程创建），为None时自行绑定
+    """
+    bind_and_activate = sock is None
+    if mode == "single":
+        server = HTTPServer((host, port), HTTPServerRequestHandler, bind_and_activate=bind_and_activate)
+    elif mode == "threadpool":
+        server = ThreadPoolHTTPServer((host, port), HTTPServerRequestHandler, bind_and_activate=bind_and_activate)
+    else:
+        raise ValueError(f"Unsupported server mode: {mode}")
+    if sock is not None:
+        server.socket.close()
+        server.socket = sock
+        server.server_address = sock.getsockname()
+    return server
+
 def run_http_server(host, port):
     """
     启动基于Python原生HTTPServer的HTTP服务
-    替代原有原生socket实现，参数/调用方式完全不变
+    替代原有原生socket实现，参数/调用方式完全不变；运行模式由SERVER_MODE配置
     """
+    server = None
     try:
         # 初始化HTTPServer：绑定地址 + 自定义请求处理器
-        server = HTTPServer((host, port), HTTPServerRequestHandler)
+        server = create_http_server(host, port)
         # 输出启动日志
         logger.info(f"[Server] HTTPServer running on http://{host}:{port}")
         logger.info(f"[Server] Debug mode: {DEBUG}, Static dir: {STATIC_DIR}")
+        if isinstance(server, ThreadPoolHTTPServer):
+            logger.info(f"[Server] Mode: threadpool, workers: {server.workers}, queue size: {server.queue_size}")
+        else:
+            logger.info(f"[Server] Mode: single")
         logger.info(f"[Server] Press CTRL+C to stop server")
 
         # 启动服务（永久运行，直到Ctrl+C终止）
@@ -306,9 +774,186 @@ def run_http_server(host, port):
         logger.error(f"[Server] Server start error: {str(e)}", exc_info=True)
     finally:
         # 关闭服务，释放端口
-        server.server_close()
+        if server:
+            server.server_close()
         logger.info("[Server] HTTPServer stopped successfully")
 
+# ===================== Pre-fork多进程服务 =====================
+class PreforkSupervisor:
+    """
+    Pre-fork主进程：fork前导入apps完成路由注册（路由表/已编译正则以写时复制方式共享），
+    再fork出N个工作进程，每个工作进程运行一个ThreadPoolHTTPServer。
+    - 监听方式：默认主进程创建一个监听socket由子进程共享；PREFORK_REUSEPORT=True时子进程各自以SO_REUSEPORT绑定
+    - 工作进程异常退出自动重启；收到SIGHUP逐个滚动重启；SIGTERM/SIGINT停止全部进程
+
+    注意：以下状态为进程内存，每个工作进程各自一份，互不共享：
+    - rate_limit中间件 _request_counts：按进程计数，同一IP实际上限约为 RATE_LIMIT_MAX * 进程数
+    - throttle/debounce中间件 _throttle_storage/_debounce_storage：请求落到不同进程时不会被节流/防抖
+    - 数据库连接：每个进程在fork之后各自建立，主进程不持有连接
+    - ORM查询缓存、登录用户缓存、角色权限索引：写操作只使本进程立即失效，其他进程在各自TTL后生效
+    （csrf中间件为无状态签名Token，任意进程签发的Token在其他进程均可校验）
+    """
+    # 进程启动后存活不足该秒数即退出视为启动失败，重启前等待，避免疯狂重启
+    MIN_WORKER_LIFETIME = 1
+    # 停止工作进程时等待其退出的最长时间（秒）：留出工作进程排空连接的时间
+    STOP_TIMEOUT = SERVER_DRAIN_TIMEOUT + 5
+
+    def __init__(self, host, port, workers=PREFORK_WORKERS, reuse_port=PREFORK_REUSEPORT):
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Prefork mode requires os.fork (POSIX only)")
+        if reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+            logger.warning("[Prefork] SO_REUSEPORT not supported, fall back to shared listening socket")
+            reuse_port = False
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.reuse_port = reuse_port
+        self.sock = None
+        self.children = {}  # {pid: 启动时间}
+        self._running = False
+        self._reload_requested = False
+
+    def _create_listen_socket(self):
+        """创建监听socket"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(SERVER_QUEUE_SIZE)
+        return sock
+
+    def _spawn_worker(self):
+        """fork一个工作进程"""
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                self._worker_main()
+            except Exception as e:
+                logger.error(f"[Prefork] Worker {os.getpid()} crashed: {str(e)}", exc_info=True)
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.children[pid] = time.time()
+        logger.info(f"[Prefork] Worker {pid} started")
+        return pid
+
+    def _worker_main(self):
+        """工作进程入口：运行线程池HTTPServer直到收到SIGTERM"""
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        sock = self._create_listen_socket() if self.reuse_port else self.sock
+        server = create_http_server(self.host, self.port, mode="threadpool", sock=sock)
+        # 数据库连接在fork之后由各工作进程自行建立并预热
+        init_db_pool(workers=server.workers)
+
+        def _graceful_stop(signum, frame):
+            # serve_forever运行在主线程，shutdown需在其他线程调用
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, _graceful_stop)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            close_db_pool()
+            password_service.shutdown()
+
+    def _stop_worker(self, pid):
+        """优雅停止指定工作进程，超时则强制结束"""
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self.children.pop(pid, None)
+            return
+        deadline = time.time() + self.STOP_TIMEOUT
+        while time.time() < deadline:
+            done_pid, _ = os.waitpid(pid, os.WNOHANG)
+            if done_pid:
+                break
+            time.sleep(0.1)
+        else:
+            logger.warning(f"[Prefork] Worker {pid} did not stop in {self.STOP_TIMEOUT}s, kill it")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.children.pop(pid, None)
+        logger.info(f"[Prefork] Worker {pid} stopped")
+
+    def _rolling_restart(self):
+        """滚动重启：先启动新进程，再停止一个旧进程，逐个替换，始终有进程在服务"""
+        logger.info(f"[Prefork] SIGHUP received, rolling restart {len(self.children)} workers")
+        for old_pid in list(self.children):
+            self._spawn_worker()
+            self._stop_worker(old_pid)
+        logger.info("[Prefork] Rolling restart finished")
+
+    def _reap_workers(self):
+        """回收已退出的工作进程并补齐"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.children.pop(pid, None)
+            if started is None:
+                continue
+            logger.error(f"[Prefork] Worker {pid} exited unexpectedly (status {status}), restart it")
+            if time.time() - started < self.MIN_WORKER_LIFETIME:
+                time.sleep(self.MIN_WORKER_LIFETIME)
+            if self._running:
+                self._spawn_worker()
+
+    def _handle_stop(self, signum, frame):
+        self._running = False
+
+    def _handle_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def run(self):
+        """主进程循环"""
+        # fork前完成路由注册，子进程写时复制共享
+        load_apps()
+        if not self.reuse_port:
+            self.sock = self._create_listen_socket()
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        self._running = True
+        for _ in range(self.workers):
+            self._spawn_worker()
+        try:
+            while self._running:
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self._rolling_restart()
+                self._reap_workers()
+                time.sleep(0.5)
+        finally:
+            logger.info(f"[Prefork] Stopping {len(self.children)} workers")
+            for pid in list(self.children):
+                self._stop_worker(pid)
+            if self.sock:
+                self.sock.close()
+
+def run_prefork_server(host, port, workers=PREFORK_WORKERS):
+    """启动Pre-fork多进程服务（仅POSIX）"""
+    # 工作进程各自建立连接池，fork前先校验配置，避免工作进程启动即退出反复重启
+    check_pool_size(SERVER_WORKERS)
+    supervisor = PreforkSupervisor(host, port, workers)
+    logger.info(f"[Prefork] Master {os.getpid()} running on http://{host}:{port}, workers: {supervisor.workers}, "
+                f"SO_REUSEPORT: {supervisor.reuse_port}")
+    logger.info(f"[Prefork] Send SIGHUP to master for rolling restart, CTRL+C to stop")
+    try:
+        supervisor.run()
+    except Exception as e:
+        logger.error(f"[Prefork] Master error: {str(e)}", exc_info=True)
+    finally:
+        logger.info("[Prefork] Server stopped successfully")
+
 # 测试：直接运行该文件启动服务
 if __name__ == "__main__":
     from config.settings import HOST, PORT
@@ -4,8 +4,11 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from config.settings import DEBUG, HOST, PORT, HOT_RELOAD
-from core.server import run_http_server
+from config.settings import DEBUG, HOST, PORT, HOT_RELOAD, SERVER_MODE, SERVER_WORKERS
+from core.router import load_apps
+from core.server import run_http_server, run_prefork_server
+from core.orm.pool import init_db_pool
+from core.aio_server import run_async_server
 from core.hot_reload import start_hot_reload_monitor
 from utils.logger import logger
 
@@ -16,10 +19,20 @@ def main():
     # if HOT_RELOAD and DEBUG:
         # start_hot_reload_monitor()
     logger.info(f"[System] Starting server on {HOST}:{PORT}, DEBUG={DEBUG}")
-    logger.info(f"[System] Hot reload: {HOT_RELOAD}")
+    logger.info(f"[System] Hot reload: {HOT_RELOAD}, server mode: {SERVER_MODE}")
  
-    # 启动原生HTTP服务
-    run_http_server(HOST, PORT)
+    # 按SERVER_MODE选择服务引擎：asyncio事件循环 / 多进程 / 原生HTTPServer（single、threadpool）
+    if SERVER_MODE == "prefork":
+        # 主进程负责导入apps并在fork前注册路由
+        run_prefork_server(HOST, PORT)
+        return
+    # 导入所有业务模块，注册路由；预热数据库连接池
+    load_apps()
+    init_db_pool(workers=1 if SERVER_MODE == "single" else SERVER_WORKERS)
+    if SERVER_MODE == "asyncio":
+        run_async_server(HOST, PORT)
+    else:
+        run_http_server(HOST, PORT)
 if __name__ == "__main__":
     print("asd")
     main()
@@ -12,6 +12,7 @@ const tableVScroll = {
         this.renderTable(el, columns);
         // 初始化实例参数
         const instance = {
+            elId,
             el,
             columns,
             data,
@@ -54,9 +55,11 @@ const tableVScroll = {
         const rowWrapper = el.querySelector('.v-table-row-wrapper');
         const totalCount = data.length;
 
-        // 空数据处理
+        // 空数据处理（保留行容器，便于后续追加数据）
         if (totalCount === 0) {
-            el.querySelector('.v-table-body').innerHTML = '<div class="v-table-empty">暂无数据</div>';
+            rowWrapper.style.height = '';
+            rowWrapper.style.transform = '';
+            rowWrapper.innerHTML = '<div class="v-table-empty">暂无数据</div>';
             return;
         }
 
@@ -86,9 +89,48 @@ const tableVScroll = {
         rowWrapper.innerHTML = rowsHtml;
     },
 
+    // 初始化无限滚动表格：滚动接近底部时按游标加载下一页
+    // url为列表接口（如/api/user/list?page_size=50），请求时追加mode=keyset及上一页返回的cursor（首页不带cursor）
+    initInfinite(elId, columns, url, rowHeight = 48) {
+        this.init(elId, columns, [], rowHeight);
+        const instance = this.instances[elId];
+        if (!instance) return;
+        instance.url = url;
+        instance.cursor = '';
+        instance.hasMore = true;
+        instance.loading = false;
+        this.loadMore(instance);
+    },
+
+    // 加载下一页数据并追加
+    async loadMore(instance) {
+        if (!instance.url || instance.loading || !instance.hasMore) return;
+        instance.loading = true;
+        try {
+            const sep = instance.url.includes('?') ? '&' : '?';
+            let url = `${instance.url}${sep}mode=keyset`;
+            if (instance.cursor) url += `&cursor=${encodeURIComponent(instance.cursor)}`;
+            const res = await api.get(url);
+            // 等待期间表格已重新初始化（如重新搜索）：丢弃旧查询的结果
+            if (this.instances[instance.elId] !== instance) return;
+            if (res.code === 200) {
+                const page = res.data;
+                instance.data = instance.data.concat(page.list);
+                instance.cursor = page.next_cursor || '';
+                instance.hasMore = !!page.has_more;
+                this.renderVisibleRows(instance);
+            }
+        } catch (err) {
+            // 请求失败保留hasMore，下次滚动时重试
+            console.error('加载更多数据失败', err);
+        } finally {
+            instance.loading = false;
+        }
+    },
+
     // 绑定滚动事件
     bindScrollEvent(instance) {
-        const { el, rowHeight, data } = instance;
+        const { el, rowHeight } = instance;
         const bodyEl = el.querySelector('.v-table-body');
 
         bodyEl.addEventListener('scroll', () => {
@@ -98,11 +140,16 @@ const tableVScroll = {
             instance.startIndex = Math.floor(instance.scrollTop / rowHeight);
             // 边界处理
             if (instance.startIndex < 0) instance.startIndex = 0;
+            const data = instance.data;
             if (instance.startIndex > data.length - instance.visibleCount) {
                 instance.startIndex = Math.max(0, data.length - instance.visibleCount);
             }
             // 重新渲染可见行
             this.renderVisibleRows(instance);
+            // 无限滚动：剩余不足一屏时预加载下一页
+            if (instance.startIndex + instance.visibleCount * 2 >= data.length) {
+                this.loadMore(instance);
+            }
         });
     },
 
@@ -1,7 +1,5 @@
 // 全局变量
-let currentPage = 1;
-let pageSize = 10;
-let total = 0;
+const pageSize = 50;  // 无限滚动每次加载条数
 let roleList = [];
 
 // 用户管理页面初始化
@@ -9,7 +7,7 @@ document.addEventListener('DOMContentLoaded', async function () {
     // 加载角色列表（用于下拉选择）
     await loadRoleList();
     // 加载用户列表
-    await loadUserList();
+    loadUserList();
     // 绑定事件
     bindEvents();
 });
@@ -29,33 +27,16 @@ async function loadRoleList() {
     }
 }
 
-// 加载用户列表
-async function loadUserList() {
-    try {
-        loading.show();
-        const keyword = document.getElementById('search-keyword').value.trim();
-        const res = await api.get('/api/user/list', {
-            page: currentPage,
-            page_size: pageSize,
-            keyword
-        });
-        if (res.code === 200) {
-            const { list, total: totalCount } = res.data;
-            total = totalCount;
-            // 渲染虚拟滚动表格
-            renderUserTable(list);
-            // 更新分页
-            updatePagination();
-        }
-    } catch (err) {
-        notify.error('用户列表加载失败');
-    } finally {
-        loading.hide();
-    }
+// 加载用户列表（游标分页，滚动到底部自动加载下一页）
+function loadUserList() {
+    const keyword = document.getElementById('search-keyword').value.trim();
+    const params = new URLSearchParams({ page_size: pageSize });
+    if (keyword) params.set('keyword', keyword);
+    renderUserTable(`/api/user/list?${params}`);
 }
 
 // 渲染用户表格
-function renderUserTable(data) {
+function renderUserTable(url) {
     const columns = [
         { prop: 'id', label: 'ID', width: 0.5 },
         { prop: 'username', label: '用户名', width: 1 },
@@ -96,47 +77,8 @@ function renderUserTable(data) {
         }
     ];
 
-    // 初始化虚拟滚动表格
-    tableVScroll.init('user-table', columns, data);
-    // 绑定表格内按钮事件
-    bindTableBtnEvents();
-}
-
-// 绑定表格内按钮事件
-function bindTableBtnEvents() {
-    // 编辑按钮
-    document.querySelectorAll('.edit-btn').forEach(btn => {
-        btn.addEventListener('click', async function () {
-            const userId = this.dataset.id;
-            await loadUserInfo(userId);
-        });
-    });
-    // 删除按钮
-    document.querySelectorAll('.delete-btn').forEach(btn => {
-        btn.addEventListener('click', function () {
-            const userId = this.dataset.id;
-            deleteUser(userId);
-        });
-    });
-}
-
-// 更新分页
-function updatePagination() {
-    pagination.init('user-pagination', {
-        page: currentPage,
-        pageSize: pageSize,
-        total: total,
-        onPageChange: (page, size) => {
-            currentPage = page;
-            pageSize = size;
-            loadUserList();
-        },
-        onSizeChange: (size, page) => {
-            currentPage = page;
-            pageSize = size;
-            loadUserList();
-        }
-    });
+    // 初始化无限滚动虚拟表格
+    tableVScroll.initInfinite('user-table', columns, url);
 }
 
 // 绑定全局事件
@@ -144,16 +86,22 @@ function bindEvents() {
     // 添加用户按钮
     document.getElementById('add-user-btn').addEventListener('click', addUser);
     // 搜索按钮
-    document.getElementById('search-btn').addEventListener('click', () => {
-        currentPage = 1;
-        loadUserList();
-    });
+    document.getElementById('search-btn').addEventListener('click', loadUserList);
     // 重置按钮
     document.getElementById('reset-btn').addEventListener('click', () => {
         document.getElementById('search-keyword').value = '';
-        currentPage = 1;
         loadUserList();
     });
+    // 表格内按钮（事件委托：虚拟滚动会重绘行，追加数据后无需重新绑定）
+    document.getElementById('user-table').addEventListener('click', e => {
+        const editBtn = e.target.closest('.edit-btn');
+        if (editBtn) {
+            loadUserInfo(editBtn.dataset.id);
+            return;
+        }
+        const deleteBtn = e.target.closest('.delete-btn');
+        if (deleteBtn) deleteUser(deleteBtn.dataset.id);
+    });
     // 回车搜索
     document.getElementById('search-keyword').addEventListener('keydown', e => {
         if (e.key === 'Enter') document.getElementById('search-btn').click();
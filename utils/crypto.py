@@ -2,72 +2,82 @@
 # -*- coding: utf-8 -*-
 """
 密码加密工具（移除bcrypt，使用Python内置hashlib+secrets实现加盐哈希）
-函数接口保持不变：encrypt_password / verify_password
+函数接口保持不变：encrypt_pwd / verify_pwd（纯计算，请求中请通过utils.password的进程池调用）
+- 存储格式：「迭代次数:盐值:哈希值」；旧格式「盐值:哈希值」按10万次迭代验证
+- 迭代次数由PWD_HASH_ITERATIONS配置，needs_rehash()判断已存密码是否需按新次数重新哈希
 """
 import hashlib
 import secrets
+from config.settings import PWD_HASH_ITERATIONS
 
 # 配置常量（可根据需求调整）
 SALT_LENGTH = 16  # 随机盐值长度（16字节，推荐）
 HASH_ALGORITHM = 'sha256'  # 哈希算法（sha256/sha512，推荐sha256）
-ITERATIONS = 100000  # 哈希迭代次数（次数越高越安全，耗时也越长，10万次兼顾安全和性能）
+ITERATIONS = PWD_HASH_ITERATIONS  # 哈希迭代次数（次数越高越安全，耗时也越长）
+LEGACY_ITERATIONS = 100000  # 旧格式（盐值:哈希值）使用的迭代次数
 
 
-def encrypt_pwd(plain_password: str) -> str:
+def _hash(plain_password: str, salt: str, iterations: int) -> str:
+    """PBKDF2加盐哈希，返回十六进制字符串"""
+    return hashlib.pbkdf2_hmac(
+        hash_name=HASH_ALGORITHM,
+        password=plain_password.encode('utf-8'),
+        salt=salt.encode('utf-8'),
+        iterations=iterations
+    ).hex()
+
+
+def _parse(encrypted_password: str):
+    """拆分已存密码为 (迭代次数, 盐值, 哈希值)，兼容旧格式"""
+    parts = encrypted_password.split(':')
+    if len(parts) == 2:
+        return LEGACY_ITERATIONS, parts[0], parts[1]
+    iterations, salt, hashed_password = parts
+    return int(iterations), salt, hashed_password
+
+
+def encrypt_pwd(plain_password: str, iterations: int = None) -> str:
     """
-    加密明文密码：生成随机盐值 + 加盐哈希，返回「盐值:哈希值」拼接的字符串
+    加密明文密码：生成随机盐值 + 加盐哈希
     :param plain_password: 明文密码
-    :return: 加密后的字符串（格式：salt:hashed_password，可直接存入数据库）
+    :param iterations: 迭代次数，默认PWD_HASH_ITERATIONS
+    :return: 加密后的字符串（格式：iterations:salt:hashed_password，可直接存入数据库）
     """
-    # 1. 生成唯一随机盐值（16字节，转为十六进制字符串，便于存储）
+    iterations = iterations or ITERATIONS
+    # 生成唯一随机盐值（16字节，转为十六进制字符串，便于存储）
     salt = secrets.token_hex(SALT_LENGTH)
-    # 2. 将密码和盐值转为bytes（哈希需要字节流）
-    password_bytes = plain_password.encode('utf-8')
-    salt_bytes = salt.encode('utf-8')
-    # 3. 加盐哈希：使用pbkdf2_hmac（行业标准的加盐哈希算法，内置模块支持）
-    hashed_bytes = hashlib.pbkdf2_hmac(
-        hash_name=HASH_ALGORITHM,
-        password=password_bytes,
-        salt=salt_bytes,
-        iterations=ITERATIONS
-    )
-    # 4. 将哈希值转为十六进制字符串，与盐值用「:」拼接返回
-    hashed_password = hashed_bytes.hex()
-    return f"{salt}:{hashed_password}"
+    return f"{iterations}:{salt}:{_hash(plain_password, salt, iterations)}"
 
 
 def verify_pwd(plain_password: str, encrypted_password: str) -> bool:
     """
     验证明文密码是否匹配加密密码
     :param plain_password: 待验证的明文密码
-    :param encrypted_password: 数据库中存储的加密密码（格式：salt:hashed_password）
+    :param encrypted_password: 数据库中存储的加密密码（iterations:salt:hashed_password 或旧格式 salt:hashed_password）
     :return: 匹配返回True，不匹配返回False
     """
     try:
-        # 1. 拆分盐值和哈希值（按「:」分割，需保证加密后的字符串格式正确）
-        salt, hashed_password = encrypted_password.split(':', 1)
-        # 2. 明文密码按相同规则加盐哈希
-        password_bytes = plain_password.encode('utf-8')
-        salt_bytes = salt.encode('utf-8')
-        verify_hashed_bytes = hashlib.pbkdf2_hmac(
-            hash_name=HASH_ALGORITHM,
-            password=password_bytes,
-            salt=salt_bytes,
-            iterations=ITERATIONS
-        )
-        verify_hashed_password = verify_hashed_bytes.hex()
-        # 3. 比较哈希值（使用恒时比较，防止时序攻击）
-        return secrets.compare_digest(verify_hashed_password, hashed_password)
-    except (ValueError, IndexError):
-        # 分割失败（加密格式错误），直接返回False
+        iterations, salt, hashed_password = _parse(encrypted_password)
+        # 比较哈希值（使用恒时比较，防止时序攻击）
+        return secrets.compare_digest(_hash(plain_password, salt, iterations), hashed_password)
+    except (ValueError, AttributeError):
+        # 格式错误（分段数不对/迭代次数非数字），直接返回False
+        return False
+
+
+def needs_rehash(encrypted_password: str) -> bool:
+    """已存密码的迭代次数与当前配置不一致（含旧格式）时需要重新哈希"""
+    try:
+        return _parse(encrypted_password)[0] != ITERATIONS
+    except (ValueError, AttributeError):
         return False
 
 
 # 测试代码（运行该文件可验证加密/验证逻辑）
 if __name__ == "__main__":
     test_pwd = "Admin@123"
-    encrypted = encrypt_password(test_pwd)
+    encrypted = encrypt_pwd(test_pwd)
     print(f"明文密码：{test_pwd}")
     print(f"加密后：{encrypted}")
-    print(f"验证正确密码：{verify_password(test_pwd, encrypted)}")  # True
-    print(f"验证错误密码：{verify_password('123456', encrypted)}")  # False
\ No newline at end of file
+    print(f"验证正确密码：{verify_pwd(test_pwd, encrypted)}")  # True
+    print(f"验证错误密码：{verify_pwd('123456', encrypted)}")  # False
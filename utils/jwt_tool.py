@@ -3,12 +3,23 @@
 """
 纯Python原生实现JWT（HS256算法）
 不依赖任何第三方库，严格遵循JWT规范，支持exp过期时间验证
+- 签名：每个密钥预先生成一次HMAC对象，每次签名copy()后使用，无需重复派生密钥
+- 缓存：验证通过的Token按摘要缓存解析后的载荷（LRU，JWT_CACHE_SIZE条），重复Token只需一次字典查找；
+  命中时仍按exp精确判断过期
 """
 import json
 import time
 import hmac
 import hashlib
+import threading
 from base64 import b64encode, b64decode
+from collections import OrderedDict
+from functools import lru_cache
+from config.settings import JWT_CACHE_SIZE
+
+# 已验证Token缓存 {(密钥, Token摘要): (载荷, exp)}，右端为最近使用
+_verified = OrderedDict()
+_verified_lock = threading.Lock()
 
 def base64url_encode(data: bytes) -> str:
     """
@@ -34,6 +45,17 @@ def base64url_decode(s: str) -> bytes:
     s = s.replace('-', '+').replace('_', '/')
     return b64decode(s)
 
+@lru_cache(maxsize=8)
+def _hmac_for(secret_key: str):
+    """按密钥预先生成的HMAC-SHA256对象（只读，使用时copy）"""
+    return hmac.new(secret_key.encode('utf-8'), digestmod=hashlib.sha256)
+
+def _sign(secret_key: str, sign_data: bytes) -> bytes:
+    """HMAC-SHA256签名：复制预生成的HMAC对象后追加数据"""
+    mac = _hmac_for(secret_key).copy()
+    mac.update(sign_data)
+    return mac.digest()
+
 def jwt_encode(payload: dict, secret_key: str, algorithm: str = "HS256") -> str:
     """
     生成JWT Token（仅支持HS256算法，符合JWT规范）
@@ -56,8 +78,7 @@ def jwt_encode(payload: dict, secret_key: str, algorithm: str = "HS256") -> str:
     # 3. 拼接头部和载荷，生成签名原始数据
     sign_data = f"{header_encoded}.{payload_encoded}".encode('utf-8')
     # 4. HMAC-SHA256生成签名，再Base64URL编码
-    secret = secret_key.encode('utf-8')
-    signature = hmac.new(secret, sign_data, hashlib.sha256).digest()
+    signature = _sign(secret_key, sign_data)
     signature_encoded = base64url_encode(signature)
     # 5. 拼接三部分得到最终Token
     return f"{header_encoded}.{payload_encoded}.{signature_encoded}"
@@ -75,6 +96,21 @@ def jwt_decode(token: str, secret_key: str, algorithm: str = "HS256", verify: bo
     if algorithm != "HS256":
         raise ValueError("Only HS256 algorithm is supported")
     
+    # 0. 已验证过的Token：直接返回缓存载荷，仅检查过期
+    if verify and JWT_CACHE_SIZE > 0:
+        key = (secret_key, hashlib.sha256(token.encode('utf-8')).digest())
+        with _verified_lock:
+            entry = _verified.get(key)
+            if entry is not None:
+                _verified.move_to_end(key)
+        if entry is not None:
+            payload, exp = entry
+            if exp is not None and time.time() > exp:
+                with _verified_lock:
+                    _verified.pop(key, None)
+                raise ValueError("Expired JWT token: token has expired")
+            return dict(payload)
+    
     # 1. 分割Token为三部分，验证格式合法性
     parts = token.split('.')
     if len(parts) != 3:
@@ -85,8 +121,7 @@ def jwt_decode(token: str, secret_key: str, algorithm: str = "HS256", verify: bo
     if verify:
         # 重新生成签名并与原签名对比
         sign_data = f"{header_encoded}.{payload_encoded}".encode('utf-8')
-        secret = secret_key.encode('utf-8')
-        expected_signature = hmac.new(secret, sign_data, hashlib.sha256).digest()
+        expected_signature = _sign(secret_key, sign_data)
         actual_signature = base64url_decode(signature_encoded)
         # 常量时间比较，防止时序攻击
         if not hmac.compare_digest(expected_signature, actual_signature):
@@ -102,4 +137,27 @@ def jwt_decode(token: str, secret_key: str, algorithm: str = "HS256", verify: bo
         if current_time > payload["exp"]:
             raise ValueError("Expired JWT token: token has expired")
     
-    return payload
\ No newline at end of file
+    # 5. 缓存验证结果（缓存副本，调用方修改返回值不影响缓存）
+    if verify and JWT_CACHE_SIZE > 0:
+        with _verified_lock:
+            _verified[key] = (dict(payload), payload.get("exp"))
+            while len(_verified) > JWT_CACHE_SIZE:
+                _verified.popitem(last=False)
+    
+    return payload
+
+def jwt_verify_batch(tokens, secret_key: str, algorithm: str = "HS256") -> list:
+    """
+    批量验证JWT Token（压测/基准用）
+    :param tokens: Token字符串列表
+    :param secret_key: 签名密钥
+    :param algorithm: 签名算法，固定为HS256
+    :return: 与tokens一一对应的载荷列表，验证失败的位置为None
+    """
+    results = []
+    for token in tokens:
+        try:
+            results.append(jwt_decode(token, secret_key, algorithm=algorithm, verify=True))
+        except ValueError:
+            results.append(None)
+    return results
\ No newline at end of file
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+密码哈希服务：PBKDF2计算放到独立进程池执行，不占用请求线程和GIL
+- 进程池使用spawn方式启动（不继承服务进程的线程/连接/监听socket），首次调用时创建；fork出的子进程各自重建
+- 并发上限：同时提交的任务数不超过PWD_HASH_MAX_PENDING，等待名额超过PWD_HASH_QUEUE_TIMEOUT秒抛出PasswordServiceBusy
+- PWD_HASH_WORKERS=0时在调用线程内直接计算（开发/调试用）
+"""
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config.settings import PWD_HASH_WORKERS, PWD_HASH_MAX_PENDING, PWD_HASH_QUEUE_TIMEOUT
+from utils.crypto import encrypt_pwd, verify_pwd, needs_rehash
+from utils.logger import logger
+
+
+class PasswordServiceBusy(Exception):
+    """密码哈希任务排队超时"""
+
+
+class PasswordService:
+    """进程池密码哈希服务（线程安全）"""
+    def __init__(self, workers=PWD_HASH_WORKERS, max_pending=PWD_HASH_MAX_PENDING, queue_timeout=PWD_HASH_QUEUE_TIMEOUT):
+        self.workers = max(0, workers)
+        self.max_pending = max(1, max_pending)
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        """获取（必要时创建）当前进程的进程池"""
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                self._pid = os.getpid()
+                logger.info(f"[Password] Hash pool started with {self.workers} workers")
+            return self._executor
+
+    def _run(self, func, *args):
+        """占用一个并发名额后在进程池中执行func，等待名额超时抛出PasswordServiceBusy"""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            logger.warning(f"[Password] Hash queue full ({self.max_pending} pending), timeout {self.queue_timeout}s")
+            raise PasswordServiceBusy("Password hashing service is busy")
+        try:
+            if self.workers == 0:
+                return func(*args)
+            executor = self._get_executor()
+            try:
+                return executor.submit(func, *args).result()
+            except BrokenProcessPool:
+                # 工作进程异常退出：丢弃进程池，下次调用重建
+                logger.error("[Password] Hash pool broken, it will be recreated on next call")
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                raise
+        finally:
+            self._slots.release()
+
+    def hash(self, plain_password):
+        """加密明文密码"""
+        return self._run(encrypt_pwd, plain_password)
+
+    def verify(self, plain_password, encrypted_password):
+        """验证密码"""
+        return self._run(verify_pwd, plain_password, encrypted_password)
+
+    @staticmethod
+    def needs_rehash(encrypted_password):
+        """已存密码的迭代次数是否与当前配置不一致（仅解析，不计算哈希）"""
+        return needs_rehash(encrypted_password)
+
+    def shutdown(self):
+        """关闭进程池（服务退出时调用）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=True)
+
+
+# 进程内全局服务
+password_service = PasswordService()